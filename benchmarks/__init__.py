@@ -0,0 +1,37 @@
+"""
+Benchmarks for django-usernameless.
+
+Each ``bench_*.py`` module is a standalone script run from the
+repository root, e.g. ``python benchmarks/bench_bulk_import.py``.
+They use ``benchmarks.settings`` unless ``DJANGO_SETTINGS_MODULE``
+points elsewhere.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup():
+    """ Configures Django and creates the benchmark tables. """
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+
+    from django.core.management import call_command
+    call_command('syncdb', interactive=False, verbosity=0)
+
+
+@contextmanager
+def timer(label, count=None):
+    """ Prints the wall time spent in the block. """
+    start = time.time()
+    yield
+    elapsed = time.time() - start
+    if count:
+        print('%-40s %8.3fs  %10.1f/s' % (label, elapsed, count / elapsed))
+    else:
+        print('%-40s %8.3fs' % (label, elapsed))
@@ -0,0 +1,59 @@
+"""
+Compares activations per second of django-registration's
+save-based activation with the patched single-lookup activation.
+
+    python benchmarks/bench_activation.py [count]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def save_based_activate(activation_key):
+    # django-registration 1.0's RegistrationManager.activate_user
+    from registration.models import RegistrationProfile
+    profile = RegistrationProfile.objects.get(activation_key=activation_key)
+    if not profile.activation_key_expired():
+        user = profile.user
+        user.is_active = True
+        user.save()
+        profile.activation_key = RegistrationProfile.ACTIVATED
+        profile.save()
+        return user
+    return False
+
+
+def register(count, prefix):
+    from django.contrib.sites.models import Site
+    from registration.models import RegistrationProfile
+    site = Site.objects.get_current()
+    keys = []
+    for i in range(count):
+        user = RegistrationProfile.objects.create_inactive_user(
+            'User %d' % i, '%s%d@example.com' % (prefix, i), None, site,
+            send_email=False)
+        keys.append(RegistrationProfile.objects.get(user=user).activation_key)
+    return keys
+
+
+def main(count):
+    setup()
+    from registration.models import RegistrationProfile
+
+    keys = register(count, 'old')
+    with timer('save-based activation', count):
+        for key in keys:
+            save_based_activate(key)
+
+    keys = register(count, 'new')
+    with timer('conditional UPDATE activation', count):
+        for key in keys:
+            RegistrationProfile.objects.activate_user(key)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,64 @@
+"""
+Seeds a large user table and times the admin user changelist with and
+without large-table mode.
+
+    python benchmarks/bench_admin_changelist.py [users]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+PAGES = 20
+
+
+def main(count):
+    setup()
+    from django.contrib import admin
+    from django.test.client import Client
+    from django.test.utils import setup_test_environment
+    from usernameless.models import User
+
+    # exposes response.context
+    setup_test_environment()
+    # registers UserAdmin, which the URLconf would only do on the first
+    # request
+    admin.autodiscover()
+
+    # no passwords, so seeding doesn't spend its time hashing
+    User.objects.bulk_create_users(
+        ({'name': 'User %d' % (i % 1000), 'email': 'user%d@example.com' % i}
+         for i in range(count)), batch_size=5000, processes=1)
+    User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+
+    client = Client()
+    client.login(username='admin@example.com', password='secret')
+    model_admin = admin.site._registry[User]
+    url = '/admin/usernameless/user/'
+
+    for large_table in (False, True):
+        model_admin.large_table = large_table
+        label = 'large table' if large_table else 'stock'
+
+        with timer('%s: first page' % label, 1):
+            client.get(url)
+
+        with timer('%s: search' % label, 1):
+            client.get(url, {'q': 'user12345'})
+
+        with timer('%s: %d pages deep' % (label, PAGES), PAGES):
+            params = {}
+            for page in range(PAGES):
+                response = client.get(url, params)
+                cl = response.context['cl']
+                if large_table:
+                    params = {'after': cl.next_seek}
+                else:
+                    params = {'p': page + 1}
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,37 @@
+"""
+Compares ``User.objects.bulk_create_users()`` with a loop over
+``User.objects.create_user()``.
+
+    python benchmarks/bench_bulk_import.py [count]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def users(count, prefix):
+    # a handful of shared names exercises slug collisions
+    for i in range(count):
+        yield {'name': 'User %d' % (i % 50),
+               'email': '%s%d@example.com' % (prefix, i),
+               'password': 'secret'}
+
+
+def main(count):
+    setup()
+    from usernameless.models import User
+
+    with timer('create_user loop (%d)' % count, count):
+        for data in users(count, 'loop'):
+            User.objects.create_user(**data)
+
+    with timer('bulk_create_users (%d)' % count, count):
+        User.objects.bulk_create_users(users(count, 'bulk'), batch_size=500)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
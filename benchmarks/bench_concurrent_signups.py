@@ -0,0 +1,93 @@
+"""
+Drives registration and login through the full request handler from
+several client threads at once and reports signups and logins per
+second, with passwords hashed on the request threads and on the
+hashing executor's process pool.
+
+Django 1.5 has no async views, so this is the concurrency harness for
+the sync views as deployed behind a threaded WSGI server.
+
+    python benchmarks/bench_concurrent_signups.py [requests] [threads] [processes]
+"""
+
+import os
+import sys
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def main(count, threads, processes):
+    handle, path = tempfile.mkstemp(suffix='.db')
+    os.close(handle)
+    os.environ['BENCHMARK_DB'] = path
+    try:
+        run(count, threads, processes)
+    finally:
+        os.remove(path)
+
+
+def run(count, threads, processes):
+    setup()
+    from django.test.utils import override_settings
+    # all clients share one address
+    with override_settings(USERNAMELESS_LOGIN_IP_LIMIT=None):
+        compare(count, threads, processes)
+
+
+def compare(count, threads, processes):
+    from django.core.urlresolvers import reverse
+    from django.db import connection
+    from django.test.client import Client
+    from usernameless import backends, hashing
+    from usernameless.models import User
+
+    register_url = reverse('registration_register')
+    login_url = reverse('auth_login')
+
+    def request(url, data):
+        client = Client()
+        try:
+            # the login view sets the test cookie it expects on the POST
+            client.get(url)
+            response = client.post(url, data)
+            assert response.status_code == 302, response.status_code
+        finally:
+            connection.close()
+
+    def signup(i, prefix):
+        request(register_url, {'name': 'User %d' % (i % 20),
+                               'email': '%s%d@example.com' % (prefix, i),
+                               'password1': 'secret',
+                               'password2': 'secret'})
+
+    def login(i, prefix):
+        request(login_url, {'username': '%s%d@example.com' % (prefix, i),
+                            'password': 'secret'})
+
+    for label, executor_processes in (('request threads', 0),
+                                      ('%d processes' % processes,
+                                       processes)):
+        hashing._executor = hashing.HashingExecutor(
+            processes=executor_processes, max_pending=count)
+        backends.reset()
+        prefix = 'p%d-' % executor_processes
+        pool = ThreadPool(threads)
+        with timer('signups, hashing on %s' % label, count):
+            pool.map(lambda i: signup(i, prefix), range(count))
+
+        User.objects.filter(email__startswith=prefix).update(is_active=True)
+        connection.close()
+        with timer('logins, hashing on %s' % label, count):
+            pool.map(lambda i: login(i, prefix), range(count))
+        pool.close()
+        hashing._executor.shutdown()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 8,
+         int(sys.argv[3]) if len(sys.argv) > 3 else 4)
@@ -0,0 +1,47 @@
+"""
+Measures ``User.objects.stream_export()`` writing CSV for a seeded user
+table, reporting rows per second and the peak RSS of the process.
+
+    python benchmarks/bench_export.py [count]
+"""
+
+import os
+import resource
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def main(count):
+    setup()
+    from django.contrib.auth.models import Group
+    from usernameless.management.commands.export_users import write_csv
+    from usernameless.models import User
+
+    User.objects.bulk_create_users(
+        ({'name': 'User %d' % i, 'email': 'export%d@example.com' % i}
+         for i in range(count)), batch_size=1000)
+    through = User.groups.through
+    groups = [Group.objects.create(name='export group %d' % i)
+              for i in range(5)]
+    for group in groups:
+        through.objects.bulk_create(
+            [through(user_id=pk, group_id=group.pk) for pk in
+             User.objects.values_list('pk', flat=True)[:count // 2]])
+
+    print('peak RSS before export %.1f MB' % peak_rss_mb())
+    with open(os.devnull, 'wb') as devnull:
+        with timer('stream_export to CSV (%d)' % count, count):
+            write_csv(devnull, User.objects.stream_export())
+    print('peak RSS after export  %.1f MB' % peak_rss_mb())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,35 @@
+"""
+Measures building and rendering the crispy login form, with the
+layout rebuilt per instance as before and with the shared helper.
+
+    python benchmarks/bench_forms.py [iterations]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def main(count):
+    setup()
+    from crispy_forms.utils import render_crispy_form
+    from usernameless.forms import AuthenticationForm
+
+    with timer('build_helper per instance', count):
+        for i in range(count):
+            AuthenticationForm.build_helper()
+
+    with timer('shared helper', count):
+        for i in range(count):
+            AuthenticationForm().helper
+
+    with timer('render', count):
+        for i in range(count):
+            render_crispy_form(AuthenticationForm())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
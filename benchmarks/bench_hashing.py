@@ -0,0 +1,50 @@
+"""
+Measures password hashing throughput on the calling thread and on the
+hashing executor for several PBKDF2 iteration counts.
+
+    python benchmarks/bench_hashing.py [hashes] [processes]
+"""
+
+import os
+import sys
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+ITERATIONS = (1000, 10000, 20000)
+
+
+def main(count, processes):
+    setup()
+    from django.contrib.auth import hashers
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+    from usernameless.hashing import HashingExecutor
+
+    for iterations in ITERATIONS:
+        hasher = type('BenchHasher', (PBKDF2PasswordHasher,),
+                      {'iterations': iterations})
+        hashers.PREFERRED_HASHER = hasher()
+        hashers.HASHERS = {hasher.algorithm: hashers.PREFERRED_HASHER}
+
+        executor = HashingExecutor(processes=0)
+        with timer('inline, %d iterations' % iterations, count):
+            for i in range(count):
+                executor.make_password('secret')
+
+        executor = HashingExecutor(processes=processes, max_pending=count)
+        threads = ThreadPool(processes * 2)
+        with timer('%d processes, %d iterations' % (processes, iterations),
+                   count):
+            threads.map(executor.make_password, ['secret'] * count)
+        stats = executor.stats()
+        print('    mean hash time %.4fs' % (stats['hash_time'] /
+                                           stats['completed']))
+        threads.close()
+        executor.shutdown()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,271 @@
+"""
+Benchmarks the account lifecycle end to end: ``create_user``, the
+registration form and ``RegistrationView``, activation, login through
+``AuthenticationForm`` and the ``UserAdmin`` changelist and search, all
+but ``create_user`` through the test client.
+
+The table is seeded with ``--users`` users first, ``--duplicates`` of
+them sharing variants of one name so that slug allocation and name
+search face a single large family of colliding slugs, which is also the
+name every new user gets.
+
+Each operation runs ``--ops`` times and reports its p50, p90 and p99
+latency and its queries per run. ``--output`` writes them as JSON, and
+``--baseline`` compares them with such a file, exiting with status 1
+when an operation got more than ``--tolerance`` slower or runs more
+queries, so CI can keep a baseline checked in:
+
+    python benchmarks/bench_lifecycle.py --output=baseline.json
+    python benchmarks/bench_lifecycle.py --baseline=baseline.json
+
+Passwords are hashed with MD5 so the latencies are the app's own,
+unless ``--real-hashing`` is given.
+"""
+
+import json
+import math
+import os
+import platform
+import sys
+import time
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup
+
+DUPLICATE_NAMES = ('John Smith', 'john smith', 'JOHN SMITH', 'John  Smith',
+                   'John-Smith', 'john_smith')
+NAME = 'John Smith'
+PASSWORD = 'secret'
+# latency differences below this are noise, whatever the tolerance
+NOISE_MS = 0.5
+
+
+def percentile(values, fraction):
+    """ Returns the nearest-rank percentile of sorted ``values``. """
+    index = int(math.ceil(fraction * len(values))) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def summarize(latencies, queries):
+    latencies = sorted(seconds * 1000 for seconds in latencies)
+    return {
+        'ops': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p90_ms': round(percentile(latencies, 0.9), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'max_ms': round(latencies[-1], 3),
+        'queries_per_op': round(float(sum(queries)) / len(queries), 2),
+    }
+
+
+def measure(results, name, calls):
+    """
+    Times each callable of the iterable ``calls`` and counts its
+    queries. Whatever the iterable does before yielding a callable,
+    e.g. fetching a form, is left out.
+    """
+    from django.db import connection, reset_queries
+    latencies, queries = [], []
+    for call in calls:
+        reset_queries()
+        start = time.time()
+        call()
+        latencies.append(time.time() - start)
+        queries.append(len(connection.queries))
+    results[name] = summary = summarize(latencies, queries)
+    print('%-24s %9.2fms %9.2fms %9.2fms %9.2f' % (
+        name, summary['p50_ms'], summary['p90_ms'], summary['p99_ms'],
+        summary['queries_per_op']))
+
+
+def expect(response, status=302):
+    if response.status_code != status:
+        raise AssertionError('%s returned %d instead of %d' % (
+            response.request['PATH_INFO'], response.status_code, status))
+
+
+def seed(users, duplicates):
+    from django.core.management import call_command
+    from usernameless.models import User
+
+    family = int(users * duplicates)
+
+    def rows():
+        for i in range(users):
+            if i < family:
+                name = DUPLICATE_NAMES[i % len(DUPLICATE_NAMES)]
+            else:
+                name = 'User %d' % (i % 1000)
+            # no passwords, so seeding doesn't spend its time hashing
+            yield {'name': name, 'email': 'user%d@example.com' % i}
+
+    start = time.time()
+    User.objects.bulk_create_users(rows(), batch_size=5000, processes=1)
+    # bulk imports skip the signals keeping the search index in sync
+    call_command('rebuild_search_index', verbosity=0)
+    print('seeded %d users, %d named like %r, in %.1fs' % (
+        users, family, NAME, time.time() - start))
+
+
+def run(options):
+    from django.core.urlresolvers import reverse
+    from django.test.client import Client
+    from registration.models import RegistrationProfile
+    from usernameless import backends
+    from usernameless.models import User
+
+    backends.reset()
+    seed(options.users, options.duplicates)
+    ops = options.ops
+    results = {}
+    print('%-24s %11s %11s %11s %9s' % ('operation', 'p50', 'p90', 'p99',
+                                        'queries'))
+
+    measure(results, 'create_user', (
+        lambda i=i: User.objects.create_user(
+            NAME, 'created%d@example.com' % i, PASSWORD)
+        for i in range(ops)))
+
+    client = Client()
+    register_url = reverse('registration_register')
+    measure(results, 'register_form', (
+        lambda: expect(client.get(register_url), 200) for i in range(ops)))
+    measure(results, 'register', (
+        lambda i=i: expect(client.post(register_url, {
+            'name': NAME,
+            'email': 'registered%d@example.com' % i,
+            'password1': PASSWORD,
+            'password2': PASSWORD}))
+        for i in range(ops)))
+
+    keys = RegistrationProfile.objects.filter(
+        user__email__startswith='registered').values_list('activation_key',
+                                                          flat=True)
+    measure(results, 'activate', (
+        lambda key=key: expect(client.get(reverse(
+            'registration_activate', kwargs={'activation_key': key})))
+        for key in list(keys)))
+
+    login_url = reverse('auth_login')
+
+    def logins():
+        for i in range(ops):
+            login_client = Client()
+            # the login view sets the test cookie it expects on the POST
+            login_client.get(login_url)
+            yield lambda: expect(login_client.post(login_url, {
+                'username': 'created%d@example.com' % i,
+                'password': PASSWORD}))
+    measure(results, 'login', logins())
+
+    User.objects.create_superuser('Admin', 'admin@example.com', PASSWORD)
+    admin_client = Client()
+    admin_client.login(username='admin@example.com', password=PASSWORD)
+    changelist_url = reverse('admin:usernameless_user_changelist')
+    for name, params in (
+            ('admin_changelist', {}),
+            ('admin_search_name', {'q': NAME}),
+            ('admin_search_email', {'q': 'user%d@example.com' % (
+                options.users // 2)})):
+        measure(results, name, (
+            lambda params=params: expect(
+                admin_client.get(changelist_url, params), 200)
+            for i in range(ops)))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns a line for each operation of ``baseline`` that got slower
+    by more than ``tolerance`` or runs more queries in ``results``.
+    """
+    regressions = []
+    for name, before in sorted(baseline['results'].items()):
+        after = results.get(name)
+        if after is None:
+            regressions.append('%s: missing' % name)
+            continue
+        for key in ('p50_ms', 'p90_ms'):
+            if (after[key] > before[key] * (1 + tolerance) and
+                    after[key] - before[key] > NOISE_MS):
+                regressions.append('%s: %s %.2f -> %.2f' % (
+                    name, key, before[key], after[key]))
+        if after['queries_per_op'] > before['queries_per_op']:
+            regressions.append('%s: queries_per_op %.2f -> %.2f' % (
+                name, before['queries_per_op'], after['queries_per_op']))
+    return regressions
+
+
+def main(argv):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--users', type='int', default=20000,
+                      help='Users to seed the table with.')
+    parser.add_option('--duplicates', type='float', default=0.5,
+                      help='Fraction of the seeded users sharing one name.')
+    parser.add_option('--ops', type='int', default=200,
+                      help='Runs of each operation.')
+    parser.add_option('--output',
+                      help='Write the results to this JSON file.')
+    parser.add_option('--baseline',
+                      help='Compare the results with this JSON file.')
+    parser.add_option('--tolerance', type='float', default=0.25,
+                      help='Allowed slowdown against the baseline.')
+    parser.add_option('--real-hashing', action='store_true', default=False,
+                      help="Hash passwords with the project's hashers.")
+    options, args = parser.parse_args(argv)
+
+    setup()
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import override_settings
+
+    overrides = {
+        # all clients share one address
+        'USERNAMELESS_LOGIN_IP_LIMIT': None,
+    }
+    if not options.real_hashing:
+        overrides['PASSWORD_HASHERS'] = (
+            'django.contrib.auth.hashers.MD5PasswordHasher',)
+    connection.use_debug_cursor = True
+    try:
+        with override_settings(**overrides):
+            results = run(options)
+    finally:
+        connection.use_debug_cursor = None
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'users': options.users,
+            'duplicates': options.duplicates,
+            'real_hashing': options.real_hashing,
+        },
+        'results': results,
+    }
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+
+    if options.baseline:
+        with open(options.baseline) as baseline:
+            baseline = json.load(baseline)
+        for key in ('users', 'duplicates', 'real_hashing'):
+            if baseline['environment'].get(key) != report['environment'][key]:
+                print('warning: the baseline was run with %s=%r' % (
+                    key, baseline['environment'].get(key)))
+        regressions = compare(results, baseline, options.tolerance)
+        for line in regressions:
+            print('REGRESSION %s' % line)
+        if regressions:
+            return 1
+        print('no regressions against %s' % options.baseline)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,52 @@
+"""
+Measures permission checks on a fresh user instance per iteration, as
+in one request each, with a cold and a warm permission cache.
+
+    python benchmarks/bench_permissions.py [iterations]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import setup, timer
+
+
+def main(count):
+    setup()
+    from django.contrib.auth.models import Group, Permission
+    from django.test.utils import override_settings
+    from usernameless.models import User
+    from usernameless.permissions import get_permission_cache
+
+    user = User.objects.create_user('alice', 'alice@example.com', 'secret')
+    for i in range(10):
+        group = Group.objects.create(name='group %d' % i)
+        group.permissions.add(*Permission.objects.all()[i * 3:i * 3 + 3])
+        user.groups.add(group)
+    user.user_permissions.add(*Permission.objects.all()[:5])
+
+    def check():
+        User.objects.get(pk=user.pk).has_perm('auth.change_group')
+
+    with override_settings(AUTHENTICATION_BACKENDS=(
+            'django.contrib.auth.backends.ModelBackend',)):
+        with timer('ModelBackend', count):
+            for i in range(count):
+                check()
+
+    with override_settings(AUTHENTICATION_BACKENDS=(
+            'usernameless.backends.CachedPermissionBackend',)):
+        cache = get_permission_cache()
+        with timer('CachedPermissionBackend, cold', count):
+            for i in range(count):
+                cache.bump_user(user.pk)
+                check()
+        with timer('CachedPermissionBackend, warm', count):
+            for i in range(count):
+                check()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
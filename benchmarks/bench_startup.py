@@ -0,0 +1,49 @@
+"""
+Measures the cold start of a minimal project using usernameless: the
+time to load the models, then the URLconf, and the modules imported
+for each, averaged over fresh interpreter processes.
+
+    python benchmarks/bench_startup.py [runs]
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+start = time.time()
+modules = len(sys.modules)
+from django.db.models import get_models
+get_models()
+models_time, models_modules = time.time() - start, len(sys.modules) - modules
+start = time.time()
+modules = len(sys.modules)
+from django.core.urlresolvers import resolve
+resolve('/accounts/register/')
+urls_time, urls_modules = time.time() - start, len(sys.modules) - modules
+print(json.dumps([models_time, models_modules, urls_time, urls_modules]))
+'''
+
+
+def main(runs):
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT, env.get('PYTHONPATH')]))
+    results = []
+    for i in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', CHILD],
+                                         env=env, cwd=ROOT)
+        results.append(json.loads(output.decode('utf-8').splitlines()[-1]))
+    for label, index in (('load models', 0), ('load URLconf', 2)):
+        times = sorted(result[index] for result in results)
+        print('%-40s %8.3fs median  %8.3fs min  %5d modules' % (
+            label, times[len(times) // 2], times[0], results[0][index + 1]))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
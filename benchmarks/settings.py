@@ -0,0 +1,50 @@
+"""
+Minimal settings for running the benchmarks against SQLite.
+
+Set ``BENCHMARK_DB`` to a file path for benchmarks which use several
+threads, as each connection to ``:memory:`` opens a separate database.
+"""
+
+import os
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCHMARK_DB', ':memory:'),
+    },
+}
+
+INSTALLED_APPS = (
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.sites',
+    'django.contrib.messages',
+    'django.contrib.admin',
+    'crispy_forms',
+    'crispy_forms_foundation',
+    'registration',
+    'impersonate',
+    'usernameless',
+)
+
+MIDDLEWARE_CLASSES = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+)
+
+AUTH_USER_MODEL = 'usernameless.User'
+ROOT_URLCONF = 'benchmarks.urls'
+# django-registration ships no templates
+TEMPLATE_DIRS = (os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              'templates'),)
+SITE_ID = 1
+SECRET_KEY = 'benchmarks'
+ACCOUNT_ACTIVATION_DAYS = 7
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+CRISPY_TEMPLATE_PACK = 'foundation'
@@ -13,7 +13,9 @@ if sys.argv[-1] == 'publish':
     os.system('python setup.py sdist register upload')
     sys.exit()
 
-packages = ['usernameless']
+packages = ['usernameless',
+            'usernameless.management',
+            'usernameless.management.commands']
 requires = ['django-impersonate==0.8.0',
             'django-registration==1.0',
             'django-autoslug==1.7.1']
@@ -22,6 +24,7 @@ setup(
     name='django-usernameless',
     version=usernameless.__version__,
     packages=packages,
+    package_data={'usernameless': ['templates/admin/usernameless/user/*.html']},
     description='Custom user without username for Django-1.5',
     long_description=open('README.md').read() + '\n\n' +
                      open('HISTORY.rst').read(),
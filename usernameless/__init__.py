@@ -3,3 +3,5 @@
 __title__ = 'usernameless'
 __version__ = '0.1.0'
 __author__ = 'Marconi Moreto'
+
+default_app_config = 'usernameless.apps.UsernamelessConfig'
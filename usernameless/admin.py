@@ -1,15 +1,48 @@
+from functools import partial
+
 from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.admin.models import LogEntry, CHANGE, DELETION
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import ReadOnlyPasswordHashField
-from django.utils.translation import ugettext_lazy as _
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.utils.translation import ugettext_lazy as _, ungettext
 from django.contrib.auth import get_user_model
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import reverse, get_script_prefix
+
+from .changelist import (EstimatedCountPaginator, IndexedSearchChangeList,
+                         LargeTableChangeList)
+from .search import get_search_backend
+from .utils import chunked
 
 User = get_user_model()
 
+# stands in for the user id when reversing the impersonation URL once
+IMPERSONATE_PLACEHOLDER = 987654321
+
+
+class UniqueEmailMixin(object):
+    """
+    Rejects emails owned by another user whatever their case, which
+    the unique index on ``normalized_email`` would otherwise only
+    report as an ``IntegrityError`` on save.
+    """
+    def clean_email(self):
+        email = self.cleaned_data["email"]
+        manager = User._default_manager
+        users = manager.filter(manager.email_query(email))
+        if self.instance.pk is not None:
+            users = users.exclude(pk=self.instance.pk)
+        if users.exists():
+            raise forms.ValidationError(_("This email is already taken."))
+        return email
+
 
-class UserCreationForm(forms.ModelForm):
+class UserCreationForm(UniqueEmailMixin, forms.ModelForm):
     """
     A form for creating new users. Includes all the
     required fields, plus a repeated password.
@@ -39,7 +72,7 @@ class UserCreationForm(forms.ModelForm):
         return user
 
 
-class UserChangeForm(forms.ModelForm):
+class UserChangeForm(UniqueEmailMixin, forms.ModelForm):
     """
     A form for updating users. Includes all the fields
     on the user, but replaces the password field with
@@ -73,6 +106,8 @@ class UserAdmin(UserAdmin):
     list_filter = ("is_staff", "is_superuser", "is_active", "groups")
     search_fields = ("name", "email")
     ordering = ("name",)
+    actions = ("bulk_activate", "bulk_deactivate",
+               "bulk_grant_staff", "bulk_revoke_staff", "bulk_delete")
     filter_horizontal = ("groups", "user_permissions",)
     fieldsets = (
         (None, {"fields": ("email", "password")}),
@@ -92,9 +127,170 @@ class UserAdmin(UserAdmin):
                            "password2")}),
     )
 
+    # maximum number of users a search returns
+    search_limit = 1000
+    # users updated or deleted per query, and per LogEntry, by the
+    # bulk actions
+    bulk_batch_size = 1000
+
+    _large_table = None
+
+    @property
+    def large_table(self):
+        """
+        Large-table mode pages with a keyset instead of OFFSET,
+        estimates the row count and drops the groups filter, for tables
+        with millions of users. Follows ``USERNAMELESS_ADMIN_LARGE_TABLE``
+        unless set on the instance.
+        """
+        if self._large_table is not None:
+            return self._large_table
+        return getattr(settings, 'USERNAMELESS_ADMIN_LARGE_TABLE', False)
+
+    @large_table.setter
+    def large_table(self, value):
+        self._large_table = value
+
+    def get_changelist(self, request, **kwargs):
+        if self.large_table:
+            return LargeTableChangeList
+        return IndexedSearchChangeList
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        if self.large_table:
+            return EstimatedCountPaginator(queryset, per_page, orphans,
+                                           allow_empty_first_page)
+        return super(UserAdmin, self).get_paginator(
+            request, queryset, per_page, orphans, allow_empty_first_page)
+
+    def get_list_filter(self, request):
+        list_filter = super(UserAdmin, self).get_list_filter(request)
+        if self.large_table:
+            # filtering on groups joins the m2m table for every row
+            list_filter = tuple(f for f in list_filter if f != "groups")
+        return list_filter
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Looks the search term up in the user search index, telling the
+        admin when there were more than ``search_limit`` matches.
+        """
+        ids = get_search_backend(self.model).search(search_term,
+                                                    self.search_limit + 1)
+        if len(ids) > self.search_limit:
+            ids = ids[:self.search_limit]
+            self.message_user(request, _(
+                "Only the first %(limit)d matches of this search are "
+                "listed, refine it to see the others.") % {
+                    "limit": self.search_limit})
+        return queryset.filter(pk__in=ids), False
+
+    def get_actions(self, request):
+        actions = super(UserAdmin, self).get_actions(request)
+        # replaced by bulk_delete, which doesn't load every user
+        actions.pop("delete_selected", None)
+        return actions
+
+    def run_bulk(self, request, queryset, method, action_flag, message):
+        """
+        Calls the manager ``method`` with the selected user ids, except
+        the acting user's, in batches of ``bulk_batch_size`` and logs
+        one ``LogEntry`` per batch. Returns the number of users.
+        """
+        ids = list(queryset.exclude(pk=request.user.pk)
+                           .values_list("pk", flat=True))
+        content_type_id = ContentType.objects.get_for_model(self.model).pk
+        for batch in chunked(ids, self.bulk_batch_size):
+            method(batch)
+            LogEntry.objects.log_action(
+                user_id=request.user.pk,
+                content_type_id=content_type_id,
+                # no single object, so no link in "Recent actions"
+                object_id="",
+                object_repr=ungettext("%d user", "%d users",
+                                      len(batch)) % len(batch),
+                action_flag=action_flag,
+                change_message=ungettext(
+                    "%(message)s %(count)d user.",
+                    "%(message)s %(count)d users.",
+                    len(batch)) % {"message": message, "count": len(batch)})
+        return len(ids)
+
+    def bulk_update(self, request, queryset, values, message):
+        count = self.run_bulk(
+            request, queryset,
+            partial(self.model._default_manager.bulk_update_users,
+                    values=values),
+            CHANGE, message)
+        self.message_user(request, ungettext(
+            "%(message)s %(count)d user.",
+            "%(message)s %(count)d users.", count) % {"message": message,
+                                                      "count": count})
+
+    def bulk_activate(self, request, queryset):
+        self.bulk_update(request, queryset, {"is_active": True},
+                         "Activated")
+    bulk_activate.short_description = _("Activate selected users")
+
+    def bulk_deactivate(self, request, queryset):
+        self.bulk_update(request, queryset, {"is_active": False},
+                         "Deactivated")
+    bulk_deactivate.short_description = _("Deactivate selected users")
+
+    def bulk_grant_staff(self, request, queryset):
+        self.bulk_update(request, queryset, {"is_staff": True},
+                         "Granted staff status to")
+    bulk_grant_staff.short_description = _("Grant staff status")
+
+    def bulk_revoke_staff(self, request, queryset):
+        self.bulk_update(request, queryset, {"is_staff": False},
+                         "Revoked staff status from")
+    bulk_revoke_staff.short_description = _("Revoke staff status")
+
+    def bulk_delete(self, request, queryset):
+        """
+        Deletes the selected users with raw DELETEs after a
+        confirmation page, without loading them or sending per-user
+        signals.
+        """
+        if not self.has_delete_permission(request):
+            raise PermissionDenied
+        if request.POST.get("post"):
+            count = self.run_bulk(request, queryset,
+                                  self.model._default_manager.bulk_delete,
+                                  DELETION, "Deleted")
+            self.message_user(request, ungettext(
+                "Deleted %(count)d user.",
+                "Deleted %(count)d users.", count) % {"count": count})
+            return None
+        opts = self.model._meta
+        context = {
+            "title": _("Are you sure?"),
+            "opts": opts,
+            "app_label": opts.app_label,
+            "count": queryset.count(),
+            "selected": request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            "select_across": request.POST.get("select_across", "0"),
+            "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+        }
+        return TemplateResponse(
+            request, "admin/usernameless/user/bulk_delete_confirmation.html",
+            context, current_app=self.admin_site.name)
+    bulk_delete.short_description = _("Delete selected users")
+
+    def impersonate_url(self, user_id):
+        # reverse() once per script prefix and fill in the id per row
+        prefix = get_script_prefix()
+        urls = self.__dict__.setdefault('_impersonate_urls', {})
+        if prefix not in urls:
+            urls[prefix] = reverse("impersonate-start",
+                                   args=(IMPERSONATE_PLACEHOLDER,))
+        return urls[prefix].replace(str(IMPERSONATE_PLACEHOLDER),
+                                    str(user_id))
+
     def impersonate_link(self, obj):
-        return u'<a href="%s">Impersonate</a>' % reverse("impersonate-start",
-                                                         args=(obj.id,))
+        return u'<a href="%s">Impersonate</a>' % self.impersonate_url(obj.id)
     impersonate_link.allow_tags = True
     impersonate_link.short_description = "impersonate"
 
@@ -0,0 +1,25 @@
+"""
+App configuration for usernameless.
+
+Django 1.7 and later call ``UsernamelessConfig.ready()`` once all
+models are loaded. Older versions have no such hook, so
+``usernameless.models`` has the receivers connected once
+django-registration's models are loaded, see
+``usernameless.receivers.connect_when_ready``.
+"""
+
+try:
+    from django.apps import AppConfig
+    HAS_APP_CONFIG = True
+except ImportError:  # Django < 1.7
+    AppConfig = object
+    HAS_APP_CONFIG = False
+
+
+class UsernamelessConfig(AppConfig):
+    name = 'usernameless'
+    verbose_name = 'Usernameless'
+
+    def ready(self):
+        from .receivers import connect
+        connect()
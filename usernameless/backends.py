@@ -0,0 +1,211 @@
+"""
+Authentication backend for usernameless users.
+
+Besides looking users up by case-insensitive email, ``EmailBackend``
+remembers emails which have no account for a short while and throttles
+attempts per client IP and per email before any password is hashed.
+It is configured with:
+
+``USERNAMELESS_LOGIN_NEGATIVE_TTL``
+    Seconds an unknown email is remembered, ``0`` disables the cache.
+
+``USERNAMELESS_LOGIN_IP_LIMIT`` / ``USERNAMELESS_LOGIN_EMAIL_LIMIT``
+    ``(attempts, seconds)`` allowed per IP / per email, ``None``
+    disables the limit.
+
+``USERNAMELESS_LOGIN_CACHE``
+    Name of a Django cache shared between processes. By default the
+    state is kept in each process.
+
+Throttling is applied by ``AuthenticationForm``, which tells the user
+why the attempt failed, and by the backend for every other caller, e.g.
+the admin login, to which a throttled attempt is just a failed one.
+
+Its permission checks are served from the cross-request cache in
+``usernameless.permissions``; ``CachedPermissionBackend`` provides
+them on their own, for use with other authentication backends. When
+``USERNAMELESS_USER_CACHE`` is set, the user of a session is resolved
+from the cache in ``usernameless.snapshots``.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .caches import TTLCache
+from .hashing import get_executor
+from .permissions import get_permission_cache
+from .snapshots import get_user_cache
+from .throttling import TokenBucket
+
+
+class LoginRateLimited(Exception):
+    """
+    Raised when a login attempt exceeds the per-IP or per-email limit.
+    """
+
+
+_state = {}
+_state_lock = threading.Lock()
+_local = threading.local()
+
+
+def _shared(name, factory):
+    if name not in _state:
+        with _state_lock:
+            if name not in _state:
+                _state[name] = factory()
+    return _state[name]
+
+
+def get_negative_cache():
+    """ Returns the cache of emails known to have no account. """
+    return _shared('negative', lambda: TTLCache(
+        maxsize=getattr(settings, 'USERNAMELESS_LOGIN_NEGATIVE_SIZE', 10000),
+        ttl=getattr(settings, 'USERNAMELESS_LOGIN_NEGATIVE_TTL', 30),
+        cache_alias=getattr(settings, 'USERNAMELESS_LOGIN_CACHE', None),
+        prefix='usernameless:nouser'))
+
+
+def get_bucket(kind):
+    """ Returns the ``'ip'`` or ``'email'`` token bucket, if enabled. """
+    def factory():
+        limit = getattr(settings, 'USERNAMELESS_LOGIN_%s_LIMIT' % kind.upper(),
+                        {'ip': (20, 60), 'email': (10, 60)}[kind])
+        if not limit:
+            return None
+        return TokenBucket(limit[0], limit[1],
+                           cache_alias=getattr(settings,
+                                               'USERNAMELESS_LOGIN_CACHE',
+                                               None),
+                           prefix='usernameless:bucket:%s' % kind)
+    return _shared('bucket:%s' % kind, factory)
+
+
+def throttle(email, request=None):
+    """
+    Consumes a login attempt of ``email`` and of the client IP of
+    ``request``, raising ``LoginRateLimited`` when either has used up
+    its attempts.
+    """
+    ip = request.META.get('REMOTE_ADDR') if request is not None else None
+    ip_bucket = get_bucket('ip')
+    if ip and ip_bucket is not None and not ip_bucket.consume(ip):
+        raise LoginRateLimited('Too many login attempts from %s' % ip)
+    email = get_user_model()._default_manager.email_key(email)
+    email_bucket = get_bucket('email')
+    if email_bucket is not None and not email_bucket.consume(email):
+        raise LoginRateLimited('Too many login attempts for %s' % email)
+
+
+@contextmanager
+def throttled(email, request=None):
+    """
+    Calls ``throttle()`` and lets ``EmailBackend`` skip its own check
+    of ``email`` within the block, so an attempt is only counted once.
+    """
+    throttle(email, request)
+    _local.throttled = get_user_model()._default_manager.email_key(email)
+    try:
+        yield
+    finally:
+        _local.throttled = None
+
+
+def reset():
+    """ Drops the negative cache and rate limit state of this process. """
+    with _state_lock:
+        _state.clear()
+
+
+class CachedPermissionsMixin(object):
+    """
+    Serves ``ModelBackend``'s permission lookups from the shared
+    permission cache, falling back to the database on a miss.
+    """
+    def _load_permissions(self, user_obj):
+        if hasattr(user_obj, '_perm_cache'):
+            return
+        cache = get_permission_cache()
+        cached = cache.get(user_obj.pk)
+        if cached is not None:
+            user_obj._perm_cache, user_obj._group_perm_cache = cached
+            return
+        versions = cache.user_versions(user_obj.pk)
+        groups = cache.group_versions(
+            user_obj.groups.values_list('pk', flat=True))
+        group_perms = super(CachedPermissionsMixin,
+                            self).get_group_permissions(user_obj)
+        all_perms = super(CachedPermissionsMixin,
+                          self).get_all_permissions(user_obj)
+        cache.set(user_obj.pk, versions, groups, all_perms, group_perms)
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if user_obj.is_anonymous() or obj is not None:
+            return set()
+        self._load_permissions(user_obj)
+        return user_obj._group_perm_cache
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if user_obj.is_anonymous() or obj is not None:
+            return set()
+        self._load_permissions(user_obj)
+        return user_obj._perm_cache
+
+
+class CachedUserMixin(object):
+    """
+    Resolves the user of a session from the user cache, when enabled.
+    """
+    def get_user(self, user_id):
+        user_cache = get_user_cache()
+        if user_cache is None:
+            return super(CachedUserMixin, self).get_user(user_id)
+        return user_cache.get_user(get_user_model(), user_id)
+
+
+class CachedPermissionBackend(CachedPermissionsMixin, ModelBackend):
+    """
+    ``ModelBackend`` with permissions served from the shared cache.
+    """
+
+
+class EmailBackend(CachedUserMixin, CachedPermissionsMixin, ModelBackend):
+    """
+    Authenticates usernameless users by their case-insensitive email,
+    verifying passwords on the hashing executor.
+    """
+    def authenticate(self, username=None, password=None, email=None,
+                     request=None, **kwargs):
+        # AuthenticationForm passes the email as ``username``
+        UserModel = get_user_model()
+        manager = UserModel._default_manager
+        raw_email = email or username
+        email = manager.email_key(raw_email)
+        if getattr(_local, 'throttled', None) != email:
+            try:
+                throttle(email, request)
+            except LoginRateLimited:
+                return None
+
+        negative_cache = get_negative_cache()
+        user = None
+        if not (negative_cache.ttl and negative_cache.get(email)):
+            try:
+                user = manager.get_by_email(raw_email)
+            except UserModel.MultipleObjectsReturned:
+                pass
+            except UserModel.DoesNotExist:
+                if negative_cache.ttl:
+                    negative_cache.set(email, True)
+        if user is None:
+            # Hash anyway so the response time doesn't reveal whether
+            # the account exists.
+            get_executor().make_password(password)
+            return None
+        if user.check_password(password):
+            return user
+        return None
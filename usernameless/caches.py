@@ -0,0 +1,99 @@
+"""
+A small in-process cache used for short-lived lookups such as
+"no user has this email" results.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import get_cache
+
+
+class TTLCache(object):
+    """
+    A thread-safe LRU cache holding at most ``maxsize`` entries, each
+    expiring ``ttl`` seconds after it was set.
+
+    When ``cache_alias`` names a configured Django cache, entries live
+    there instead, so that several processes share them and see each
+    other's changes right away; ``maxsize`` then doesn't apply.
+    """
+    def __init__(self, maxsize=10000, ttl=60, cache_alias=None,
+                 prefix='usernameless'):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.prefix = prefix
+        self.shared = get_cache(cache_alias) if cache_alias else None
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _shared_key(self, key):
+        return '%s:%s' % (self.prefix,
+                          hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def get(self, key, default=None):
+        if self.shared is not None:
+            return self.shared.get(self._shared_key(key), default)
+        now = time.time()
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None and item[1] > now:
+                # re-insert to mark the entry as recently used
+                self._data[key] = item
+                return item[0]
+        return default
+
+    def _set_local(self, key, value, expires):
+        # called with the lock held
+        self._data.pop(key, None)
+        self._data[key] = (value, expires)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def set(self, key, value):
+        if self.shared is not None:
+            self.shared.set(self._shared_key(key), value, self.ttl)
+            return
+        with self._lock:
+            self._set_local(key, value, time.time() + self.ttl)
+
+    def incr(self, key, delta=1):
+        """
+        Atomically adds ``delta`` to the number stored under ``key``,
+        starting from 0, and returns the result. The entry keeps the
+        expiry it got when it was created.
+        """
+        if self.shared is not None:
+            shared_key = self._shared_key(key)
+            self.shared.add(shared_key, 0, self.ttl)
+            try:
+                return self.shared.incr(shared_key, delta)
+            except ValueError:
+                # expired between add() and incr()
+                if self.shared.add(shared_key, delta, self.ttl):
+                    return delta
+                return self.shared.incr(shared_key, delta)
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                item = (0, now + self.ttl)
+            value = item[0] + delta
+            self._set_local(key, value, item[1])
+        return value
+
+    def delete(self, key):
+        if self.shared is not None:
+            self.shared.delete(self._shared_key(key))
+            return
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
@@ -0,0 +1,148 @@
+"""
+Admin changelist pieces for user tables too large for the stock
+``ChangeList``: indexed search, an estimated-count paginator and
+keyset pagination.
+"""
+
+from django.contrib.admin.views.main import ChangeList, ORDER_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+
+SEEK_VAR = 'after'
+
+
+def estimate_count(queryset):
+    """
+    Returns the planner's row estimate for an unfiltered ``queryset``,
+    or ``None`` when the database can't provide one cheaply.
+    """
+    if queryset.query.where:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    cursor = connection.cursor()
+    if connection.vendor == 'postgresql':
+        cursor.execute("SELECT reltuples FROM pg_class "
+                       "WHERE oid = %s::regclass", [table])
+    elif connection.vendor == 'mysql':
+        cursor.execute("SELECT table_rows FROM information_schema.tables "
+                       "WHERE table_schema = DATABASE() AND table_name = %s",
+                       [table])
+    else:
+        return None
+    row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    A paginator which trusts the database's row estimate instead of
+    running ``COUNT(*)`` for unfiltered querysets above ``threshold``
+    rows.
+    """
+    threshold = 100000
+
+    def _get_count(self):
+        if self._count is None:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= self.threshold:
+                self._count = estimate
+            else:
+                self._count = super(EstimatedCountPaginator, self)._get_count()
+        return self._count
+    count = property(_get_count)
+
+
+class IndexedSearchChangeList(ChangeList):
+    """
+    A ChangeList which searches through ``ModelAdmin.get_search_results``
+    instead of OR-ing ``icontains`` lookups over ``search_fields``,
+    which no index can serve.
+    """
+    def get_query_set(self, request):
+        search_fields, self.search_fields = self.search_fields, ()
+        try:
+            qs = super(IndexedSearchChangeList, self).get_query_set(request)
+        finally:
+            self.search_fields = search_fields
+        if self.search_fields and self.query:
+            qs, use_distinct = self.model_admin.get_search_results(
+                request, qs, self.query)
+            if use_distinct:
+                qs = qs.distinct()
+        return qs
+
+
+class LargeTableChangeList(IndexedSearchChangeList):
+    """
+    A ChangeList which pages through rows ordered by
+    ``seek_fields`` with a keyset (``?after=<pk>``) instead of an
+    OFFSET and counts the rows at most once.
+
+    Orderings picked in the changelist header fall back to the stock
+    numbered pages.
+    """
+    seek_fields = ('name', 'pk')
+
+    def get_query_set(self, request):
+        self.seek = self.params.pop(SEEK_VAR, None)
+        return super(LargeTableChangeList, self).get_query_set(request)
+
+    def get_ordering(self, request, queryset):
+        if ORDER_VAR in self.params:
+            return super(LargeTableChangeList, self).get_ordering(request,
+                                                                  queryset)
+        return list(self.seek_fields)
+
+    def get_results(self, request):
+        self.seek_mode = ORDER_VAR not in self.params
+        if not self.seek_mode:
+            return super(LargeTableChangeList, self).get_results(request)
+
+        paginator = self.model_admin.get_paginator(request, self.query_set,
+                                                   self.list_per_page)
+        result_count = paginator.count
+        if not self.query_set.query.where:
+            full_result_count = result_count
+        else:
+            full_result_count = (estimate_count(self.root_query_set) or
+                                 self.root_query_set.count())
+
+        qs = self.query_set
+        if self.seek:
+            qs = self.seek_after(qs, self.seek)
+        rows = list(qs[:self.list_per_page + 1])
+        result_list = rows[:self.list_per_page]
+
+        self.next_seek = None
+        if len(rows) > self.list_per_page:
+            self.next_seek = result_list[-1].pk
+        self.result_count = result_count
+        self.full_result_count = full_result_count
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = bool(self.seek or self.next_seek)
+        self.paginator = paginator
+
+    def seek_after(self, queryset, pk):
+        """
+        Filters ``queryset`` down to rows after the row ``pk`` in
+        ``seek_fields`` order.
+        """
+        field = self.seek_fields[0]
+        try:
+            value = self.root_query_set.filter(pk=pk).values_list(
+                field, flat=True)[0]
+        except (IndexError, ValueError):
+            return queryset
+        return queryset.filter(Q(**{field + '__gt': value}) |
+                               Q(**{field: value, 'pk__gt': pk}))
+
+    def next_page_url(self):
+        if self.next_seek is None:
+            return None
+        return self.get_query_string({SEEK_VAR: self.next_seek})
+
+    def first_page_url(self):
+        return self.get_query_string({SEEK_VAR: None})
@@ -0,0 +1,41 @@
+from django.db import router
+
+from autoslug import AutoSlugField
+from autoslug.utils import crop_slug, get_prepopulated_value
+
+from .metrics import stage
+
+
+class UserSlugField(AutoSlugField):
+    """
+    An AutoSlugField which allocates new unique slugs from a counter
+    per base slug (see ``SlugCounter``) instead of probing the database
+    for ``<slug>``, ``<slug>-2``, ``<slug>-3``... until one is free.
+
+    Slugs which were already allocated in bulk (see
+    ``usernameless.slugs``) and slugs of saved instances are trusted
+    as they are.
+    """
+    def pre_save(self, instance, add):
+        value = getattr(instance, self.attname)
+        if getattr(instance, '_slug_allocated', False):
+            return value
+        if value and (instance.pk or not add):
+            return value
+        if value or not self.unique:
+            return super(UserSlugField, self).pre_save(instance, add)
+
+        from .models import SlugCounter
+        slug = self.slugify(get_prepopulated_value(self, instance) or '')
+        base = crop_slug(self, slug or instance._meta.module_name)
+        db = (instance._state.db or
+              router.db_for_write(type(instance), instance=instance))
+        with stage('allocate_slug'):
+            slug = SlugCounter.objects.db_manager(db).allocate(
+                self, type(instance), base)
+        setattr(instance, self.attname, slug)
+        return slug
+
+    def south_field_triple(self):
+        args, kwargs = super(UserSlugField, self).south_field_triple()[1:]
+        return ('usernameless.fields.UserSlugField', args, kwargs)
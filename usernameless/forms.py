@@ -1,7 +1,13 @@
 from django import forms
 from django.utils.translation import ugettext_lazy as _
 from django.contrib.auth import get_user_model
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import reverse, get_script_prefix
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD
+from django.contrib.auth.tokens import default_token_generator
+from django.contrib.sites.models import get_current_site
 from django.contrib.auth.forms import (
     AuthenticationForm as BaseAuthenticationForm,
     PasswordResetForm as BasePasswordResetForm,
@@ -10,15 +16,49 @@ from django.contrib.auth.forms import (
 from crispy_forms.helper import FormHelper
 from crispy_forms_foundation.layout import Layout, Row, Column, Submit, HTML
 
-User = get_user_model()
+from .backends import LoginRateLimited, get_negative_cache, throttled
+from .metrics import stage
+from .reset import is_suppressed, send_password_reset
 
 
-class RegistrationForm(forms.Form):
+class StaticHTML(HTML):
+    """
+    An HTML layout object whose markup is final, so it is output as
+    is instead of being compiled as a template on every render.
+    """
+    def render(self, *args, **kwargs):
+        return mark_safe(self.html)
+
+
+_helpers = {}
+
+
+class CachedHelperMixin(object):
+    """
+    Builds the crispy-forms helper once per form class, language and
+    script prefix with ``build_helper()`` and shares it, read-only,
+    between all instances.
+    """
+    @classmethod
+    def build_helper(cls):
+        raise NotImplementedError
+
+    @property
+    def helper(self):
+        key = (type(self), get_language(), get_script_prefix())
+        helper = _helpers.get(key)
+        if helper is None:
+            helper = _helpers[key] = self.build_helper()
+        return helper
+
+
+class RegistrationForm(CachedHelperMixin, forms.Form):
     """
     Copied from registration.forms.RegistrationForm but
     strip off username and added unique email validation.
     """
     required_css_class = 'required'
+    duplicate_email_message = _("This email is already taken.")
 
     name = forms.CharField(label=_("Name"))
     email = forms.EmailField(label=_("E-mail"))
@@ -28,9 +68,16 @@ class RegistrationForm(forms.Form):
                                 label=_("Password (again)"))
 
     def __init__(self, *args, **kwargs):
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.layout = Layout(
+        # RegistrationView skips the uniqueness query and relies on the
+        # unique constraint instead, see RegistrationView.form_valid.
+        self.check_unique_email = kwargs.pop('check_unique_email', True)
+        super(RegistrationForm, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def build_helper(cls):
+        helper = FormHelper()
+        helper.form_method = 'post'
+        helper.layout = Layout(
             Row(Column('name')),
             Row(Column('email')),
             Row(Column('password1')),
@@ -38,15 +85,19 @@ class RegistrationForm(forms.Form):
             Row(Column(Submit('submit', _('Submit'))),
                 css_class='form-actions'),
         )
-        super(RegistrationForm, self).__init__(*args, **kwargs)
+        return helper
 
     def clean_email(self):
         """
         Validate that the supplied email address is unique for the
         site.
         """
-        if User.objects.filter(email__iexact=self.cleaned_data['email']):
-            raise forms.ValidationError(_("This email is already taken."))
+        if self.check_unique_email:
+            with stage('clean_email'):
+                exists = get_user_model()._default_manager.email_exists(
+                    self.cleaned_data['email'])
+            if exists:
+                raise forms.ValidationError(self.duplicate_email_message)
         return self.cleaned_data['email']
 
     def clean(self):
@@ -62,43 +113,127 @@ class RegistrationForm(forms.Form):
         return self.cleaned_data
 
 
-class AuthenticationForm(BaseAuthenticationForm):
-    def __init__(self, *args, **kwargs):
+class AuthenticationForm(CachedHelperMixin, BaseAuthenticationForm):
+    error_messages = dict(BaseAuthenticationForm.error_messages, **{
+        'rate_limited': _("Too many login attempts. Please try again "
+                          "in a minute."),
+    })
+
+    @classmethod
+    def build_helper(cls):
         reset_url = reverse('auth_password_reset')
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.layout = Layout(
+        helper = FormHelper()
+        helper.form_method = 'post'
+        helper.layout = Layout(
             Row(Column('username')),
             Row(Column('password')),
             Row(Column(Submit('submit', _('Login')),
                        css_class='large-2'),
-                Column(HTML('<a href="%s" class="forgot-password">Forgot password?</a>' % reset_url),
+                Column(StaticHTML('<a href="%s" class="forgot-password">Forgot password?</a>' % reset_url),
                        css_class='large-10'),
                 css_class='form-actions collapse'),
         )
-        super(AuthenticationForm, self).__init__(*args, **kwargs)
+        return helper
 
+    def clean(self):
+        """
+        Same as the base form, but throttles attempts per email and,
+        given the request, per client IP before authenticating.
+        """
+        username = self.cleaned_data.get('username')
+        password = self.cleaned_data.get('password')
 
-class PasswordResetForm(BasePasswordResetForm):
-    def __init__(self, *args, **kwargs):
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.layout = Layout(
+        if username and password:
+            try:
+                with throttled(username, self.request):
+                    self.user_cache = authenticate(username=username,
+                                                   password=password)
+            except LoginRateLimited:
+                raise forms.ValidationError(self.error_messages['rate_limited'])
+            if self.user_cache is None:
+                raise forms.ValidationError(
+                    self.error_messages['invalid_login'] % {
+                        'username': self.username_field.verbose_name
+                    })
+            elif not self.user_cache.is_active:
+                raise forms.ValidationError(self.error_messages['inactive'])
+        self.check_for_test_cookie()
+        return self.cleaned_data
+
+
+class PasswordResetForm(CachedHelperMixin, BasePasswordResetForm):
+    @classmethod
+    def build_helper(cls):
+        helper = FormHelper()
+        helper.form_method = 'post'
+        helper.layout = Layout(
             Row(Column('email')),
             Row(Column(Submit('submit', _('Submit'))),
                 css_class='form-actions'),
         )
-        super(PasswordResetForm, self).__init__(*args, **kwargs)
+        return helper
 
+    def clean_email(self):
+        """
+        Validates that an active user exists with the given email
+        address, looking it up through the normalized email index.
+        Addresses sent a reset email recently are accepted without a
+        lookup and left out by ``save()``; addresses known to have no
+        account are rejected without one.
+        """
+        email = self.cleaned_data['email']
+        manager = get_user_model()._default_manager
+        key = manager.email_key(email)
+        self.users_cache = []
+        if is_suppressed(key):
+            return email
+        negative_cache = get_negative_cache()
+        if negative_cache.ttl and negative_cache.get(key):
+            raise forms.ValidationError(self.error_messages['unknown'])
+        self.users_cache = list(manager.filter(manager.email_query(email)))
+        if not self.users_cache and negative_cache.ttl:
+            negative_cache.set(key, True)
+        if not any(user.is_active for user in self.users_cache):
+            raise forms.ValidationError(self.error_messages['unknown'])
+        if any((user.password == UNUSABLE_PASSWORD)
+               for user in self.users_cache):
+            raise forms.ValidationError(self.error_messages['unusable'])
+        return email
 
-class SetPasswordForm(BaseSetPasswordForm):
-    def __init__(self, *args, **kwargs):
-        self.helper = FormHelper()
-        self.helper.form_method = 'post'
-        self.helper.layout = Layout(
+    def save(self, domain_override=None,
+             subject_template_name='registration/password_reset_subject.txt',
+             email_template_name='registration/password_reset_email.html',
+             use_https=False, token_generator=default_token_generator,
+             from_email=None, request=None):
+        """
+        Queues the reset emails with ``send_password_reset`` instead of
+        sending them one by one during the request.
+        """
+        if not self.users_cache:
+            return
+        if domain_override:
+            site_name = domain = domain_override
+        else:
+            current_site = get_current_site(request)
+            site_name, domain = current_site.name, current_site.domain
+        send_password_reset(self.users_cache, from_email,
+                            domain=domain,
+                            site_name=site_name,
+                            use_https=use_https,
+                            token_generator=token_generator,
+                            subject_template_name=subject_template_name,
+                            email_template_name=email_template_name)
+
+
+class SetPasswordForm(CachedHelperMixin, BaseSetPasswordForm):
+    @classmethod
+    def build_helper(cls):
+        helper = FormHelper()
+        helper.form_method = 'post'
+        helper.layout = Layout(
             Row(Column('new_password1')),
             Row(Column('new_password2')),
             Row(Column(Submit('submit', _('Update'))),
                 css_class='form-actions'),
         )
-        super(SetPasswordForm, self).__init__(*args, **kwargs)
+        return helper
@@ -0,0 +1,173 @@
+"""
+Password hashing helpers.
+
+``get_executor()`` returns the process-wide ``HashingExecutor`` which
+``User.set_password`` and ``User.check_password`` hash through, so
+PBKDF2 work can be moved off request threads and bounded under load.
+It is configured with:
+
+``USERNAMELESS_HASHING_PROCESSES``
+    Number of hashing processes. ``0``, the default, hashes on the
+    calling thread.
+
+``USERNAMELESS_HASHING_MAX_PENDING``
+    Number of hashes that may be queued or running at once before
+    further requests are rejected with ``HashingQueueFull``.
+
+``USERNAMELESS_HASHING_TIMEOUT``
+    Seconds to wait for a queued hash before giving up.
+"""
+
+import multiprocessing
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import (make_password, check_password,
+                                         get_hasher, identify_hasher,
+                                         is_password_usable)
+
+
+def create_pool(processes=None):
+    """
+    Returns a process pool for ``hash_passwords``, or ``None`` when
+    hashing should stay on the calling thread.
+    """
+    if processes == 1:
+        return None
+    return multiprocessing.Pool(processes)
+
+
+def hash_passwords(raw_passwords, pool=None, chunksize=64):
+    """
+    Hashes ``raw_passwords`` with the default hasher and returns the
+    hashes in the same order. Hashing is spread across ``pool`` when
+    one is given.
+    """
+    raw_passwords = list(raw_passwords)
+    if pool is None or len(raw_passwords) < 2:
+        return [make_password(raw) for raw in raw_passwords]
+    return pool.map(make_password, raw_passwords, chunksize)
+
+
+class HashingQueueFull(Exception):
+    """
+    Raised when the hashing executor already has its maximum number of
+    hashes pending.
+    """
+
+
+def _timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return result, time.time() - start
+
+
+class HashingExecutor(object):
+    """
+    Runs password hashing on a pool of worker processes, or on the
+    calling thread when ``processes`` is ``0``, with at most
+    ``max_pending`` hashes in flight.
+    """
+    def __init__(self, processes=0, max_pending=64, timeout=30):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_time = 0.0
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = multiprocessing.Pool(self.processes)
+        return self._pool
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def run(self, func, *args):
+        """
+        Runs ``func(*args)`` and returns its result, raising
+        ``HashingQueueFull`` right away if too many hashes are pending.
+        """
+        if not self._slots.acquire(False):
+            self._count(rejected=1)
+            raise HashingQueueFull('%d password hashes pending'
+                                   % self.max_pending)
+        self._count(pending=1)
+        try:
+            if self.processes:
+                async_result = self._get_pool().apply_async(_timed,
+                                                            (func,) + args)
+                result, elapsed = async_result.get(self.timeout)
+            else:
+                result, elapsed = _timed(func, *args)
+        finally:
+            self._count(pending=-1)
+            self._slots.release()
+        self._count(completed=1, hash_time=elapsed)
+        return result
+
+    def make_password(self, raw_password):
+        if not raw_password:
+            # unusable passwords involve no hashing
+            return make_password(raw_password)
+        return self.run(make_password, raw_password)
+
+    def check_password(self, raw_password, encoded, setter=None):
+        """
+        Same as ``django.contrib.auth.hashers.check_password``, with the
+        verification run on the executor.
+        """
+        if not raw_password or not is_password_usable(encoded):
+            return False
+        is_correct = self.run(check_password, raw_password, encoded)
+        must_update = (identify_hasher(encoded).algorithm !=
+                       get_hasher('default').algorithm)
+        if setter and is_correct and must_update:
+            setter(raw_password)
+        return is_correct
+
+    def stats(self):
+        """
+        Returns the queue depth and hashing counters, e.g. for metrics.
+        """
+        with self._lock:
+            return {'pending': self.pending,
+                    'completed': self.completed,
+                    'rejected': self.rejected,
+                    'hash_time': self.hash_time}
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """ Returns the executor configured by the settings. """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = HashingExecutor(
+                    processes=getattr(settings,
+                                      'USERNAMELESS_HASHING_PROCESSES', 0),
+                    max_pending=getattr(settings,
+                                        'USERNAMELESS_HASHING_MAX_PENDING', 64),
+                    timeout=getattr(settings,
+                                    'USERNAMELESS_HASHING_TIMEOUT', 30))
+    return _executor
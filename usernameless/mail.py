@@ -0,0 +1,82 @@
+"""
+Delivery of emails queued in the outbox (see ``OutboxMessage``).
+"""
+
+import logging
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxSender(object):
+    """
+    Drains the outbox in batches, sending each batch over a single
+    connection of the configured email backend and rescheduling failed
+    batches with exponential backoff.
+    """
+    def __init__(self, batch_size=100, threads=1, backend=None):
+        self.batch_size = batch_size
+        self.threads = threads
+        self.backend = backend
+        self.retry_delay = getattr(settings, 'USERNAMELESS_OUTBOX_RETRY_DELAY', 60)
+        self.max_attempts = getattr(settings, 'USERNAMELESS_OUTBOX_MAX_ATTEMPTS', 5)
+
+    def send_batch(self, messages):
+        """
+        Sends ``messages`` over one connection, returning the number of
+        messages sent.
+        """
+        emails = [EmailMessage(m.subject, m.body, m.from_email,
+                               m.recipient_list()) for m in messages]
+        try:
+            conn = get_connection(self.backend)
+            conn.send_messages(emails)
+        except Exception as e:
+            logger.warning('Sending %d outbox messages failed: %s',
+                           len(messages), e)
+            OutboxMessage.objects.mark_failed(messages, str(e),
+                                              retry_delay=self.retry_delay,
+                                              max_attempts=self.max_attempts)
+            return 0
+        OutboxMessage.objects.mark_sent(messages)
+        return len(messages)
+
+    def drain_one(self):
+        """
+        Claims and sends batches until the outbox has nothing due,
+        returning the number of messages sent.
+        """
+        sent = 0
+        try:
+            while True:
+                messages = OutboxMessage.objects.claim(self.batch_size)
+                if not messages:
+                    return sent
+                sent += self.send_batch(messages)
+        finally:
+            if self.threads > 1:
+                # worker threads hold their own database connection
+                connection.close()
+
+    def drain(self):
+        """
+        Sends everything due in the outbox, using ``threads`` threads
+        that each claim their own batches. Returns the number of
+        messages sent.
+        """
+        if self.threads <= 1:
+            return self.drain_one()
+        pool = ThreadPool(self.threads)
+        try:
+            results = [pool.apply_async(self.drain_one)
+                       for i in range(self.threads)]
+            return sum(result.get() for result in results)
+        finally:
+            pool.close()
+            pool.join()
@@ -0,0 +1,60 @@
+"""
+A management command which fills ``User.normalized_email`` for rows
+created before the column existed.
+
+Rows are walked in primary key order in batches, each batch committed
+in its own transaction, so the command can be interrupted and re-run
+at any time. Rows whose email collides case-insensitively with another
+user are left empty and reported.
+
+"""
+
+from optparse import make_option
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+
+class Command(BaseCommand):
+    help = "Fill in the normalized email of existing users"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+                    dest='batch_size',
+                    type='int',
+                    default=1000,
+                    help='Number of users updated per transaction.'),
+    )
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        manager = User._default_manager
+        db = manager.db
+        batch_size = options['batch_size']
+        last_pk, updated, conflicts = 0, 0, []
+
+        while True:
+            rows = list(manager.filter(normalized_email__isnull=True,
+                                       pk__gt=last_pk)
+                               .order_by('pk')
+                               .values_list('pk', 'email')[:batch_size])
+            if not rows:
+                break
+            with transaction.commit_on_success(using=db):
+                for pk, email in rows:
+                    sid = transaction.savepoint(using=db)
+                    try:
+                        manager.filter(pk=pk).update(
+                            normalized_email=manager.email_key(email))
+                    except IntegrityError:
+                        transaction.savepoint_rollback(sid, using=db)
+                        conflicts.append(email)
+                    else:
+                        transaction.savepoint_commit(sid, using=db)
+                        updated += 1
+            last_pk = rows[-1][0]
+
+        self.stdout.write('Updated %d users.' % updated)
+        for email in conflicts:
+            self.stderr.write('Duplicate email, not updated: %s' % email)
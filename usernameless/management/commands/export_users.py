@@ -0,0 +1,88 @@
+"""
+A management command which exports every user with their group names
+as CSV or JSON lines, optionally gzipped.
+
+Users are streamed from ``User.objects.stream_export()``, so memory use
+stays flat however many users there are.
+
+"""
+
+import csv
+import gzip
+import json
+import sys
+from optparse import make_option
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.encoding import force_bytes
+
+COLUMNS = ('name', 'email', 'slug', 'date_joined', 'is_active', 'groups')
+
+
+def write_csv(stream, rows):
+    writer = csv.writer(stream)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        values = row[:3] + (row[3].isoformat(), int(row[4]),
+                            '|'.join(row[5]))
+        writer.writerow([force_bytes(value) for value in values])
+
+
+def write_jsonl(stream, rows):
+    for row in rows:
+        data = dict(zip(COLUMNS, row))
+        data['date_joined'] = data['date_joined'].isoformat()
+        stream.write(force_bytes(json.dumps(data)) + b'\n')
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl}
+
+
+class Command(BaseCommand):
+    args = '[<file>]'
+    help = "Export users as CSV or JSON lines to a file or stdout"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    dest='format',
+                    choices=sorted(WRITERS),
+                    help='Output format, guessed from the file extension '
+                         'when omitted.'),
+        make_option('--gzip',
+                    action='store_true',
+                    dest='gzip',
+                    default=False,
+                    help='Compress the output, implied by a .gz file.'),
+        make_option('--chunk-size',
+                    dest='chunk_size',
+                    type='int',
+                    default=2000,
+                    help='Number of users read per query.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) > 1:
+            raise CommandError('Expected at most one output file.')
+        path = args[0] if args else '-'
+
+        name = path[:-3] if path.endswith('.gz') else path
+        fmt = options['format'] or name.rsplit('.', 1)[-1].lower()
+        if fmt not in WRITERS:
+            if path != '-':
+                raise CommandError('Unknown output format %r, '
+                                   'use --format.' % fmt)
+            fmt = 'csv'
+
+        stream = sys.stdout if path == '-' else open(path, 'wb')
+        output = stream
+        if options['gzip'] or path.endswith('.gz'):
+            output = gzip.GzipFile(fileobj=stream, mode='wb')
+        try:
+            WRITERS[fmt](output, get_user_model().objects.stream_export(
+                chunk_size=options['chunk_size']))
+        finally:
+            if output is not stream:
+                output.close()
+            if stream is not sys.stdout:
+                stream.close()
@@ -0,0 +1,80 @@
+"""
+A management command which bulk imports users from a CSV or JSON
+lines file.
+
+Rows are streamed from the file and handed to
+``User.objects.bulk_create_users()``, so memory use stays bounded by
+the batch size. CSV files need a header row naming the columns, e.g.
+``name,email,password``; JSON lines files hold one object per line.
+
+"""
+
+import csv
+import json
+import sys
+from optparse import make_option
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        yield dict((key, value) for key, value in row.items() if value != '')
+
+
+def read_jsonl(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+class Command(BaseCommand):
+    args = '<file>'
+    help = "Bulk import users from a CSV or JSON lines file ('-' for stdin)"
+
+    option_list = BaseCommand.option_list + (
+        make_option('--format',
+                    dest='format',
+                    choices=sorted(READERS),
+                    help='Input format, guessed from the file extension '
+                         'when omitted.'),
+        make_option('--batch-size',
+                    dest='batch_size',
+                    type='int',
+                    default=1000,
+                    help='Number of users inserted per query.'),
+        make_option('--processes',
+                    dest='processes',
+                    type='int',
+                    default=None,
+                    help='Number of password hashing processes, '
+                         'defaults to the number of CPUs.'),
+    )
+
+    def handle(self, *args, **options):
+        if len(args) != 1:
+            raise CommandError('Expected a single input file.')
+        path = args[0]
+
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in READERS:
+            raise CommandError('Unknown input format %r, use --format.' % fmt)
+
+        stream = sys.stdin if path == '-' else open(path)
+        try:
+            created = get_user_model().objects.bulk_create_users(
+                READERS[fmt](stream),
+                batch_size=options['batch_size'],
+                processes=options['processes'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write('Imported %d users.' % created)
@@ -0,0 +1,96 @@
+"""
+A management command which deletes expired registrations, i.e. users
+who signed up but never activated, in bounded batches.
+
+Unlike ``cleanupregistration``, users are never loaded one by one:
+expired ids are found with a keyset scan over the primary key and each
+batch is removed with one DELETE per table (see
+``UserManager.raw_delete``) in its own transaction, with a pause
+between batches so the database keeps serving other traffic. The last
+purged id can be saved to a checkpoint file to resume an interrupted
+run.
+
+"""
+
+import datetime
+import json
+import os
+import time
+from optparse import make_option
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import NoArgsCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(NoArgsCommand):
+    help = "Delete expired, never activated registrations in batches"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    dest='batch_size',
+                    type='int',
+                    default=1000,
+                    help='Number of users deleted per transaction.'),
+        make_option('--sleep',
+                    dest='sleep',
+                    type='float',
+                    default=0.5,
+                    help='Seconds to pause between batches.'),
+        make_option('--checkpoint',
+                    dest='checkpoint',
+                    help='File recording the last purged user id, '
+                         'read on start to resume.'),
+    )
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as f:
+            return json.load(f)['last_id']
+
+    def write_checkpoint(self, path, last_id):
+        if path:
+            with open(path + '.tmp', 'w') as f:
+                json.dump({'last_id': last_id}, f)
+            os.rename(path + '.tmp', path)
+
+    def handle_noargs(self, **options):
+        User = get_user_model()
+        manager = User._default_manager
+        batch_size = options['batch_size']
+        checkpoint = options['checkpoint']
+        verbosity = int(options['verbosity'])
+
+        cutoff = timezone.now() - datetime.timedelta(
+            days=settings.ACCOUNT_ACTIVATION_DAYS)
+        expired = manager.expired_registrations(cutoff)
+        last_id = self.read_checkpoint(checkpoint)
+        purged, start = 0, time.time()
+
+        while True:
+            ids = list(expired.filter(pk__gt=last_id)
+                              .order_by('pk')
+                              .values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.commit_on_success(using=manager.db):
+                manager.raw_delete(ids)
+            last_id = ids[-1]
+            self.write_checkpoint(checkpoint, last_id)
+            purged += len(ids)
+            if verbosity > 1:
+                self.stdout.write('Purged %d users (%.1f/s), last id %d.'
+                                  % (purged, purged / (time.time() - start),
+                                     last_id))
+            if len(ids) < batch_size:
+                break
+            time.sleep(options['sleep'])
+
+        elapsed = time.time() - start
+        if verbosity > 0:
+            self.stdout.write('Purged %d users in %.1fs (%.1f/s).'
+                              % (purged, elapsed,
+                                 purged / elapsed if elapsed else 0))
@@ -0,0 +1,30 @@
+"""
+A management command which creates the user search index and fills it
+from the existing users.
+
+"""
+
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from usernameless.search import get_search_backend
+
+
+class Command(NoArgsCommand):
+    help = "Create and fill the user search index"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    dest='batch_size',
+                    type='int',
+                    default=1000,
+                    help='Number of users indexed per batch.'),
+    )
+
+    def handle_noargs(self, **options):
+        backend = get_search_backend()
+        backend.setup()
+        backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt the %s search index.'
+                          % backend.__class__.__name__)
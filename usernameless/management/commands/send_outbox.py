@@ -0,0 +1,52 @@
+"""
+A management command which delivers the emails queued in the outbox,
+such as activation emails written during registration.
+
+Run it from cron, or keep it running with ``--loop``.
+
+"""
+
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from usernameless.mail import OutboxSender
+
+
+class Command(NoArgsCommand):
+    help = "Deliver queued emails from the outbox"
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--batch-size',
+                    dest='batch_size',
+                    type='int',
+                    default=100,
+                    help='Number of messages sent per connection.'),
+        make_option('--threads',
+                    dest='threads',
+                    type='int',
+                    default=1,
+                    help='Number of sending threads.'),
+        make_option('--loop',
+                    action='store_true',
+                    dest='loop',
+                    default=False,
+                    help='Keep polling the outbox instead of exiting.'),
+        make_option('--interval',
+                    dest='interval',
+                    type='float',
+                    default=5,
+                    help='Seconds between polls with --loop.'),
+    )
+
+    def handle_noargs(self, **options):
+        sender = OutboxSender(batch_size=options['batch_size'],
+                              threads=options['threads'])
+        while True:
+            sent = sender.drain()
+            if int(options['verbosity']) > 0 and (sent or not options['loop']):
+                self.stdout.write('Sent %d messages.' % sent)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,150 @@
+"""
+Per-stage timings of the registration pipeline.
+
+Each stage, e.g. ``set_password`` or ``create_profile``, is wrapped in
+``stage(name)``, which reports its wall time, and optionally the number
+of database queries it ran, to the configured metrics backend. With no
+backend configured a stage costs a settings lookup. It is configured
+with:
+
+``USERNAMELESS_METRICS``
+    Dotted path of the backend class, e.g.
+    ``'usernameless.metrics.LoggingMetrics'`` or
+    ``'usernameless.metrics.StatsdMetrics'``. Unset disables metrics.
+
+``USERNAMELESS_METRICS_QUERIES``
+    Also count queries, ``False`` by default. Django 1.5 can only count
+    queries through its debug cursor, so the outermost stage turns it
+    on for its duration and drops what it recorded afterwards.
+
+``USERNAMELESS_STATSD_HOST`` / ``USERNAMELESS_STATSD_PORT`` / ``USERNAMELESS_STATSD_PREFIX``
+    Where ``StatsdMetrics`` sends its UDP packets, ``'localhost'``,
+    ``8125`` and ``'usernameless'`` by default.
+"""
+
+import logging
+import socket
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.utils.importlib import import_module
+
+logger = logging.getLogger('usernameless.metrics')
+
+
+class BaseMetrics(object):
+    def report(self, name, seconds, queries=None):
+        """
+        Records that stage ``name`` took ``seconds`` and ran ``queries``
+        queries, ``None`` when queries aren't counted.
+        """
+        raise NotImplementedError
+
+
+class LoggingMetrics(BaseMetrics):
+    """ Logs each stage to the ``usernameless.metrics`` logger. """
+    def report(self, name, seconds, queries=None):
+        logger.info('%s took %.1fms, %s queries', name, seconds * 1000,
+                    '?' if queries is None else queries)
+
+
+class StatsdMetrics(BaseMetrics):
+    """
+    Sends each stage as a StatsD timer, and its queries as a counter,
+    over UDP without waiting for anything.
+    """
+    def __init__(self, host=None, port=None, prefix=None):
+        self.address = (
+            host or getattr(settings, 'USERNAMELESS_STATSD_HOST', 'localhost'),
+            port or getattr(settings, 'USERNAMELESS_STATSD_PORT', 8125))
+        self.prefix = prefix or getattr(settings, 'USERNAMELESS_STATSD_PREFIX',
+                                        'usernameless')
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def report(self, name, seconds, queries=None):
+        packet = '%s.%s:%d|ms' % (self.prefix, name, seconds * 1000)
+        if queries is not None:
+            packet += '\n%s.%s.queries:%d|c' % (self.prefix, name, queries)
+        try:
+            self.socket.sendto(packet.encode('ascii'), self.address)
+        except socket.error:
+            pass
+
+
+_metrics = {}
+
+
+def get_metrics():
+    """ Returns the configured metrics backend, or ``None``. """
+    path = getattr(settings, 'USERNAMELESS_METRICS', None)
+    if not path:
+        return None
+    if path not in _metrics:
+        module, name = path.rsplit('.', 1)
+        _metrics[path] = getattr(import_module(module), name)()
+    return _metrics[path]
+
+
+_local = threading.local()
+
+
+def _uses_debug_cursor(connection):
+    return (connection.use_debug_cursor or
+            (connection.use_debug_cursor is None and settings.DEBUG))
+
+
+def _start_counting():
+    depth = getattr(_local, 'depth', 0)
+    if not depth:
+        _local.forced = []
+        for connection in connections.all():
+            if not _uses_debug_cursor(connection):
+                _local.forced.append((connection, connection.use_debug_cursor,
+                                      len(connection.queries)))
+                connection.use_debug_cursor = True
+    _local.depth = depth + 1
+    return [(connection, len(connection.queries))
+            for connection in connections.all()]
+
+
+def _stop_counting(marks):
+    queries = sum(len(connection.queries) - count
+                  for connection, count in marks)
+    _local.depth -= 1
+    if not _local.depth:
+        for connection, use_debug_cursor, count in _local.forced:
+            connection.use_debug_cursor = use_debug_cursor
+            del connection.queries[count:]
+    return queries
+
+
+class stage(object):
+    """
+    Reports the time spent in the block as stage ``name``::
+
+        with stage('create_profile'):
+            ...
+    """
+    def __init__(self, name):
+        self.name = name
+        self.metrics = get_metrics()
+
+    def __enter__(self):
+        if self.metrics is not None:
+            self.marks = None
+            if getattr(settings, 'USERNAMELESS_METRICS_QUERIES', False):
+                self.marks = _start_counting()
+            self.start = time.time()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.metrics is None:
+            return
+        seconds = time.time() - self.start
+        queries = None
+        if self.marks is not None:
+            queries = _stop_counting(self.marks)
+        self.metrics.report(self.name, seconds, queries)
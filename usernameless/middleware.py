@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.http import HttpResponse
+
+from .hashing import HashingQueueFull
+
+
+class HashingBackpressureMiddleware(object):
+    """
+    Answers with ``503 Service Unavailable`` when the hashing executor
+    rejects a password hash because its queue is full.
+    """
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingQueueFull):
+            response = HttpResponse('Too many requests, please retry shortly.',
+                                    status=503,
+                                    content_type='text/plain')
+            response['Retry-After'] = str(
+                getattr(settings, 'USERNAMELESS_HASHING_RETRY_AFTER', 5))
+            return response
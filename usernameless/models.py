@@ -2,15 +2,22 @@
 Patches for the registration.models.RegistrationManager methods.
 """
 
-import hashlib
-import random
+import binascii
+import os
+import re
+import uuid
 import warnings
-from autoslug import AutoSlugField
+from datetime import timedelta
 
-from django.db import transaction
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import CASCADE, F, Q
+from django.db.models.signals import pre_delete, post_delete
+from django.db.models.query import QuerySet
 from django.utils import timezone
 from django.contrib.gis.db import models
 from django.core.mail import send_mail
+from django.template.loader import render_to_string
 from django.utils.http import urlquote
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ImproperlyConfigured
@@ -19,11 +26,284 @@ from django.contrib.auth.models import (BaseUserManager,
                                         PermissionsMixin,
                                         SiteProfileNotAvailable)
 
+from .fields import UserSlugField
+from .hashing import create_pool, get_executor, hash_passwords
+from .metrics import stage
+from . import signals
+from .search import get_search_backend
+from .slugs import SlugAllocator, suffix_slug
+from .snapshots import get_user_cache
+from .utils import chunked
+
+
+_profile_models = {}
+
+
+def get_profile_model():
+    """
+    Returns the model named by ``AUTH_PROFILE_MODULE``, resolved once
+    per setting value, or raises ``SiteProfileNotAvailable``.
+    """
+    module = getattr(settings, 'AUTH_PROFILE_MODULE', False)
+    if module in _profile_models:
+        return _profile_models[module]
+    if not module:
+        raise SiteProfileNotAvailable(
+            'You need to set AUTH_PROFILE_MODULE in your project '
+            'settings')
+    try:
+        app_label, model_name = module.split('.')
+    except ValueError:
+        raise SiteProfileNotAvailable(
+            'app_label and model_name should be separated by a dot in '
+            'the AUTH_PROFILE_MODULE setting')
+    try:
+        model = models.get_model(app_label, model_name)
+    except (ImportError, ImproperlyConfigured):
+        raise SiteProfileNotAvailable
+    if model is None:
+        raise SiteProfileNotAvailable(
+            'Unable to load the profile model, check '
+            'AUTH_PROFILE_MODULE in your project settings')
+    _profile_models[module] = model
+    return model
+
+
+def prefetch_profiles(users, batch_size=1000):
+    """
+    Fills the ``get_profile()`` cache of ``users`` with one query per
+    ``batch_size`` users instead of one per user. Users without a
+    profile are left alone, so ``get_profile()`` still raises for them.
+    """
+    users = [user for user in users if not hasattr(user, '_profile_cache')]
+    if not users:
+        return
+    model = get_profile_model()
+    db = users[0]._state.db
+    for batch in chunked(users, batch_size):
+        by_id = dict((user.pk, user) for user in batch)
+        for profile in model._default_manager.using(db).filter(
+                user__id__in=list(by_id)):
+            user = by_id[profile.user_id]
+            profile.user = user
+            user._profile_cache = profile
+
+
+class UserQuerySet(QuerySet):
+    _with_profiles = False
+    profile_batch_size = 1000
+
+    def with_profiles(self):
+        """
+        Prefetches the profiles of the users as they are fetched, see
+        ``prefetch_profiles()``.
+        """
+        return self._clone(_with_profiles=True)
+
+    def _clone(self, klass=None, setup=False, **kwargs):
+        kwargs.setdefault('_with_profiles', self._with_profiles)
+        return super(UserQuerySet, self)._clone(klass, setup, **kwargs)
+
+    def iterator(self):
+        users = super(UserQuerySet, self).iterator()
+        if not self._with_profiles:
+            return users
+        return self._prefetching_iterator(users)
+
+    def _prefetching_iterator(self, users):
+        for batch in chunked(users, self.profile_batch_size):
+            prefetch_profiles(batch, self.profile_batch_size)
+            for user in batch:
+                yield user
+
 
 class UserManager(BaseUserManager):
-    def create_user(self, name, email, password=None):
+    def get_query_set(self):
+        return UserQuerySet(self.model, using=self._db)
+
+    def with_profiles(self):
+        return self.get_query_set().with_profiles()
+
+    @classmethod
+    def email_key(cls, email):
+        """
+        Returns the case-insensitive lookup key stored in
+        ``User.normalized_email`` for ``email``.
+        """
+        return cls.normalize_email(email).lower()
+
+    def email_query(self, email):
+        """
+        Returns a ``Q`` matching the users owning ``email``, ignoring
+        case, through the unique index on ``normalized_email``. Rows
+        ``backfill_normalized_emails`` hasn't filled yet, or skipped as
+        conflicts, are matched on ``email`` instead; the index serves
+        their ``IS NULL`` too.
+        """
+        return (Q(normalized_email=self.email_key(email)) |
+                Q(normalized_email__isnull=True, email__iexact=email))
+
+    def get_by_natural_key(self, email):
+        return self.get_by_email(email)
+
+    def get_by_email(self, email):
+        """
+        Returns the user owning ``email``, ignoring case. A row without
+        ``normalized_email`` only counts when no other row owns it.
+        """
+        users = list(self.filter(self.email_query(email)))
+        owners = [user for user in users
+                  if user.normalized_email is not None] or users
+        if not owners:
+            raise self.model.DoesNotExist(
+                "User matching query does not exist.")
+        if len(owners) > 1:
+            raise self.model.MultipleObjectsReturned(
+                "More than one user owns %s." % email)
+        return owners[0]
+
+    def email_exists(self, email):
+        return self.filter(self.email_query(email)).exists()
+
+    def search(self, term, limit=20):
+        """
+        Returns up to ``limit`` users whose name or email matches
+        ``term``, best matches first, through the user search index.
+        """
+        ids = get_search_backend(self.model).search(term, limit)
+        users = self.in_bulk(ids)
+        return [users[pk] for pk in ids if pk in users]
+
+    def expired_registrations(self, cutoff):
+        """
+        Returns the inactive users who registered before ``cutoff`` and
+        never activated their account. Users deactivated after
+        activation keep their account.
+        """
+        from registration.models import RegistrationProfile
+        return (self.filter(is_active=False,
+                            date_joined__lte=cutoff,
+                            registrationprofile__isnull=False)
+                    .exclude(registrationprofile__activation_key=
+                             RegistrationProfile.ACTIVATED))
+
+    export_fields = ('name', 'email', 'slug', 'date_joined', 'is_active')
+
+    def stream_export(self, chunk_size=2000):
+        """
+        Yields ``(name, email, slug, date_joined, is_active, groups)``
+        for every user in primary key order, ``groups`` being the sorted
+        group names. Users are read ``chunk_size`` at a time, seeking by
+        primary key, with one ordered membership query per chunk, so
+        memory use doesn't grow with the table.
+        """
+        memberships = self.model.groups.through._base_manager.using(self.db)
+        users = self.order_by('pk').values_list('pk', *self.export_fields)
+        last = None
+        while True:
+            chunk = users if last is None else users.filter(pk__gt=last)
+            rows = list(chunk[:chunk_size])
+            if not rows:
+                return
+            last = rows[-1][0]
+            groups = {}
+            for user_id, name in (memberships
+                                  .filter(user__gte=rows[0][0],
+                                          user__lte=last)
+                                  .order_by('user', 'group__name')
+                                  .values_list('user', 'group__name')
+                                  .iterator()):
+                groups.setdefault(user_id, []).append(name)
+            for row in rows:
+                yield row[1:] + (groups.get(row[0], []),)
+
+    def raw_deletable(self, related):
+        """
+        Returns whether the rows of ``related`` referencing users can go
+        with a plain DELETE, as Django would fast-delete them: they
+        cascade, nothing references them and no receiver listens for
+        their deletion. That covers the m2m tables, registration
+        profiles and admin log entries.
+        """
+        model = related.model
+        return (related.field.rel.on_delete is CASCADE and
+                not model._meta.get_all_related_objects(include_hidden=True)
+                and not pre_delete.has_listeners(model)
+                and not post_delete.has_listeners(model))
+
+    def raw_delete(self, ids):
+        """
+        Deletes the users ``ids`` and every row referencing them, e.g.
+        their group and permission m2m rows and registration profile,
+        with one DELETE per table in one transaction. No instances are
+        loaded and no signals are sent, so the search index is updated
+        here.
+
+        When a table references users in a way ``raw_deletable()``
+        rejects, e.g. ``SET_NULL`` or ``PROTECT``, the users are deleted
+        through Django's collector instead, with per-user signals.
+        """
+        ids = list(ids)
+        if not ids:
+            return
+        db = self._db or router.db_for_write(self.model)
+        related_objects = self.model._meta.get_all_related_objects(
+            include_hidden=True)
+        with transaction.commit_on_success(using=db):
+            if not all(self.raw_deletable(related)
+                       for related in related_objects):
+                self.using(db).filter(pk__in=ids).delete()
+                return
+            for related in related_objects:
+                related.model._base_manager.using(db).filter(
+                    **{'%s__in' % related.field.name: ids})._raw_delete(db)
+            self.using(db).filter(pk__in=ids)._raw_delete(db)
+        backend = get_search_backend(self.model)
+        for pk in ids:
+            backend.remove(pk, using=db)
+        user_cache = get_user_cache()
+        if user_cache is not None:
+            user_cache.bump_many(ids)
+
+    def bulk_update_users(self, ids, values, batch_size=1000):
+        """
+        Sets the field ``values`` on the users ``ids`` with one UPDATE
+        per ``batch_size`` users and returns the number of rows updated.
+        ``users_updated`` is sent once per batch instead of ``post_save``
+        once per user.
+        """
+        updated = 0
+        for batch in chunked(ids, batch_size):
+            updated += self.filter(pk__in=batch).update(**values)
+            signals.users_updated.send(sender=self.model, ids=batch,
+                                       values=values)
+        return updated
+
+    def bulk_activate(self, ids, batch_size=1000):
+        return self.bulk_update_users(ids, {'is_active': True}, batch_size)
+
+    def bulk_deactivate(self, ids, batch_size=1000):
+        return self.bulk_update_users(ids, {'is_active': False}, batch_size)
+
+    def bulk_delete(self, ids, batch_size=1000):
+        """
+        Deletes the users ``ids`` with ``raw_delete()`` in batches of
+        ``batch_size``, one transaction each, and returns their number.
+        ``users_deleted`` is sent once per committed batch instead of
+        ``post_delete`` once per user.
+        """
+        deleted = 0
+        for batch in chunked(ids, batch_size):
+            self.raw_delete(batch)
+            deleted += len(batch)
+            signals.users_deleted.send(sender=self.model, ids=batch)
+        return deleted
+
+    def create_user(self, name, email, password=None, **extra_fields):
         """
         Creates and saves a User with the given email, name and password.
+        Any other User fields, e.g. ``is_active``, can be passed as
+        keyword arguments so the user is written with a single INSERT.
         """
         if not name:
             msg = "Users must have a name"
@@ -33,21 +313,152 @@ class UserManager(BaseUserManager):
             msg = "Users must have an email address"
             raise ValueError(msg)
 
-        user = self.model(name=name, email=UserManager.normalize_email(email))
-        user.set_password(password)
-        user.save(using=self._db)
+        user = self.model(name=name,
+                          email=UserManager.normalize_email(email),
+                          **extra_fields)
+        with stage('set_password'):
+            user.set_password(password)
+        with stage('save_user'):
+            user.save(using=self._db)
         return user
 
     def create_superuser(self, name, email, password):
         """
         Creates and saves a superuser with the given email, name and password.
         """
-        user = self.create_user(name=name, email=email, password=password)
-        user.is_admin = True
-        user.is_staff = True
-        user.is_superuser = True
-        user.save(using=self._db)
-        return user
+        return self.create_user(name=name, email=email, password=password,
+                                is_admin=True,
+                                is_staff=True,
+                                is_superuser=True)
+
+    def bulk_create_users(self, users, batch_size=1000, processes=None):
+        """
+        Creates users from an iterable of dicts holding ``name``,
+        ``email``, an optional raw ``password`` and any other User
+        fields, returning the number of users created.
+
+        Passwords are hashed across a pool of ``processes`` worker
+        processes, slugs are allocated in memory against the slugs
+        already in the database and rows are inserted with
+        ``bulk_create`` in chunks of ``batch_size``, one transaction
+        per chunk.
+        """
+        slug_field = self.model._meta.get_field('slug')
+        taken = self.values_list('slug', flat=True).iterator()
+        allocator = SlugAllocator(slug_field, taken)
+        pool = create_pool(processes)
+        created = 0
+        try:
+            for chunk in chunked(users, batch_size):
+                fields = [dict(data) for data in chunk]
+                passwords = hash_passwords(
+                    [data.pop('password', None) for data in fields], pool)
+                new_users = []
+                for data, password in zip(fields, passwords):
+                    name, email = data.pop('name', None), data.pop('email', None)
+                    if not name:
+                        raise ValueError("Users must have a name")
+                    if not email:
+                        raise ValueError("Users must have an email address")
+                    email = UserManager.normalize_email(email)
+                    user = self.model(name=name,
+                                      email=email,
+                                      normalized_email=email.lower(),
+                                      password=password,
+                                      **data)
+                    user.slug = allocator.allocate(name)
+                    user._slug_allocated = True
+                    new_users.append(user)
+                with transaction.commit_on_success(using=self._db):
+                    self.bulk_create(new_users)
+                    SlugCounter.objects.db_manager(self._db).sync(
+                        allocator.last_indexes())
+                created += len(new_users)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return created
+
+
+class SlugCounterManager(models.Manager):
+    def allocate(self, field, model, base):
+        """
+        Returns the next free slug for ``base``, following
+        AutoSlugField's ``<base>-<index>`` naming.
+
+        The highest index handed out per base is kept in a counter row
+        which is incremented in place and then read back. The UPDATE
+        locks the row until the transaction ends, so concurrent workers
+        registering the same name never get the same index, whatever
+        the isolation level, and no query probes for every taken
+        sibling. Only the first allocation of a base seeds the counter
+        from existing slugs.
+        """
+        manager = model._default_manager.db_manager(self.db)
+        counters = self.filter(base=base)
+        while True:
+            if counters.update(last_index=F('last_index') + 1):
+                index = counters.values_list('last_index', flat=True)[0]
+            else:
+                index = self._seed(field, manager, base) + 1
+                sid = transaction.savepoint(using=self.db)
+                try:
+                    self.create(base=base, last_index=index)
+                    transaction.savepoint_commit(sid, using=self.db)
+                except IntegrityError:
+                    # another worker created the counter first
+                    transaction.savepoint_rollback(sid, using=self.db)
+                    continue
+            slug = base if index == 1 else suffix_slug(field, base, index)
+            # the slug may still be taken by a name which slugifies to
+            # it, e.g. "Alice 2" against the "alice" counter.
+            if not manager.filter(**{field.name: slug}).exists():
+                return slug
+
+    def _seed(self, field, manager, base):
+        prefix = base + field.index_sep
+        suffix = re.compile(r'^%s(\d+)$' % re.escape(prefix))
+        slugs = manager.filter(Q(**{field.name: base}) |
+                               Q(**{field.name + '__startswith': prefix}))
+        last_index = 0
+        for slug in slugs.values_list(field.name, flat=True).iterator():
+            match = suffix.match(slug)
+            if slug == base:
+                last_index = max(last_index, 1)
+            elif match:
+                last_index = max(last_index, int(match.group(1)))
+        return last_index
+
+    def sync(self, last_indexes):
+        """
+        Moves counters forward to the indexes in ``last_indexes``, a
+        dict of base slug to the highest index allocated elsewhere.
+        """
+        if not last_indexes:
+            return
+        existing = dict(self.filter(base__in=list(last_indexes))
+                            .values_list('base', 'last_index'))
+        self.bulk_create([self.model(base=base, last_index=index)
+                          for base, index in last_indexes.items()
+                          if base not in existing])
+        for base, index in last_indexes.items():
+            if base in existing and existing[base] < index:
+                self.filter(base=base, last_index__lt=index).update(
+                    last_index=index)
+
+
+class SlugCounter(models.Model):
+    """
+    The highest index handed out for a base user slug.
+    """
+    base = models.CharField(max_length=255, primary_key=True)
+    last_index = models.PositiveIntegerField(default=0)
+
+    objects = SlugCounterManager()
+
+    def __unicode__(self):
+        return u'%s-%d' % (self.base, self.last_index)
 
 
 class User(AbstractBaseUser, PermissionsMixin):
@@ -56,6 +467,12 @@ class User(AbstractBaseUser, PermissionsMixin):
                               max_length=255,
                               unique=True,
                               db_index=True)
+    # lower-cased ``email`` for indexed case-insensitive lookups, kept
+    # in sync by ``save()``.
+    normalized_email = models.CharField(max_length=255,
+                                        unique=True,
+                                        null=True,
+                                        editable=False)
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["name"]
@@ -65,10 +482,32 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_staff = models.BooleanField(default=False)
     date_joined = models.DateTimeField(_('date joined'), default=timezone.now)
 
-    slug = AutoSlugField(populate_from='name', unique=True)
+    slug = UserSlugField(populate_from='name', unique=True)
 
     objects = UserManager()
 
+    class Meta:
+        # serves the admin's keyset pagination, see LargeTableChangeList
+        index_together = [['name', 'id']]
+
+    def save(self, *args, **kwargs):
+        self.normalized_email = UserManager.email_key(self.email)
+        super(User, self).save(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        self.password = get_executor().make_password(raw_password)
+
+    def check_password(self, raw_password):
+        """
+        Returns a boolean of whether the raw_password was correct,
+        verified on the hashing executor.
+        """
+        def setter(raw_password):
+            self.set_password(raw_password)
+            self.save(update_fields=["password"])
+        return get_executor().check_password(raw_password, self.password,
+                                             setter)
+
     def get_absolute_url(self):
         return "/users/%s/" % urlquote(self.slug)
 
@@ -85,49 +524,205 @@ class User(AbstractBaseUser, PermissionsMixin):
         warnings.warn("The use of AUTH_PROFILE_MODULE to define user profiles has been deprecated.",
             PendingDeprecationWarning)
         if not hasattr(self, '_profile_cache'):
-            from django.conf import settings
-            if not getattr(settings, 'AUTH_PROFILE_MODULE', False):
-                raise SiteProfileNotAvailable(
-                    'You need to set AUTH_PROFILE_MODULE in your project '
-                    'settings')
-            try:
-                app_label, model_name = settings.AUTH_PROFILE_MODULE.split('.')
-            except ValueError:
-                raise SiteProfileNotAvailable(
-                    'app_label and model_name should be separated by a dot in '
-                    'the AUTH_PROFILE_MODULE setting')
-            try:
-                model = models.get_model(app_label, model_name)
-                if model is None:
-                    raise SiteProfileNotAvailable(
-                        'Unable to load the profile model, check '
-                        'AUTH_PROFILE_MODULE in your project settings')
-                self._profile_cache = model._default_manager.using(
-                    self._state.db).get(user__id__exact=self.id)
-                self._profile_cache.user = self
-            except (ImportError, ImproperlyConfigured):
-                raise SiteProfileNotAvailable
+            self._profile_cache = get_profile_model()._default_manager.using(
+                self._state.db).get(user__id__exact=self.id)
+            self._profile_cache.user = self
         return self._profile_cache
 
     def __unicode__(self):
         return self.email
 
 
+class OutboxManager(models.Manager):
+    def enqueue(self, subject, body, from_email, recipients):
+        """
+        Stores an email to be delivered by the ``send_outbox`` command.
+        Called inside a transaction, the email is only queued if the
+        transaction commits.
+        """
+        return self.create(subject=subject,
+                           body=body,
+                           from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                           recipients=','.join(recipients))
+
+    def enqueue_many(self, messages, from_email=None):
+        """
+        Stores ``(subject, body, recipients)`` emails with one INSERT,
+        like ``enqueue()``.
+        """
+        from_email = from_email or settings.DEFAULT_FROM_EMAIL
+        return self.bulk_create([
+            self.model(subject=subject, body=body, from_email=from_email,
+                       recipients=','.join(recipients))
+            for subject, body, recipients in messages])
+
+    def claim(self, limit, lease=300):
+        """
+        Claims up to ``limit`` due messages for ``lease`` seconds and
+        returns them. Claiming is a single conditional UPDATE, so
+        concurrent workers never pick the same message.
+        """
+        now = timezone.now()
+        due = self.filter(sent__isnull=True, next_attempt__lte=now).filter(
+            Q(claimed_until__isnull=True) | Q(claimed_until__lt=now))
+        ids = list(due.order_by('next_attempt')
+                      .values_list('pk', flat=True)[:limit])
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        due.filter(pk__in=ids).update(
+            claim=token, claimed_until=now + timedelta(seconds=lease))
+        return list(self.filter(claim=token).order_by('pk'))
+
+    def mark_sent(self, messages):
+        self.filter(pk__in=[m.pk for m in messages]).update(
+            sent=timezone.now(), claimed_until=None)
+
+    def mark_failed(self, messages, error, retry_delay=60, max_attempts=5):
+        """
+        Reschedules ``messages`` with exponential backoff, giving up on
+        a message after ``max_attempts`` attempts.
+        """
+        now = timezone.now()
+        for message in messages:
+            attempts = message.attempts + 1
+            if attempts >= max_attempts:
+                next_attempt = None
+            else:
+                next_attempt = now + timedelta(
+                    seconds=retry_delay * 2 ** (attempts - 1))
+            self.filter(pk=message.pk).update(attempts=attempts,
+                                              next_attempt=next_attempt,
+                                              claimed_until=None,
+                                              last_error=error)
+
+
+class OutboxMessage(models.Model):
+    """
+    An email waiting to be delivered by the ``send_outbox`` command.
+    """
+    subject = models.TextField()
+    body = models.TextField()
+    from_email = models.CharField(max_length=255)
+    recipients = models.TextField()
+    created = models.DateTimeField(default=timezone.now)
+    # ``None`` once delivery has been given up on.
+    next_attempt = models.DateTimeField(default=timezone.now,
+                                        null=True,
+                                        db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    sent = models.DateTimeField(null=True, blank=True)
+    claim = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    objects = OutboxManager()
+
+    def __unicode__(self):
+        return self.subject
+
+    def recipient_list(self):
+        return [email for email in self.recipients.split(',') if email]
+
+
+def queue_activation_email(registration_profile, site):
+    """
+    Renders the activation email of ``registration_profile`` like
+    ``RegistrationProfile.send_activation_email`` and queues it in the
+    outbox instead of sending it right away.
+    """
+    ctx_dict = {'activation_key': registration_profile.activation_key,
+                'expiration_days': settings.ACCOUNT_ACTIVATION_DAYS,
+                'site': site}
+    subject = render_to_string('registration/activation_email_subject.txt',
+                               ctx_dict)
+    # Email subject *must not* contain newlines
+    subject = ''.join(subject.splitlines())
+    message = render_to_string('registration/activation_email.txt',
+                               ctx_dict)
+    return OutboxMessage.objects.enqueue(subject, message,
+                                         settings.DEFAULT_FROM_EMAIL,
+                                         [registration_profile.user.email])
+
+
 @transaction.commit_on_success
 def create_inactive_user(self, name, email, password, site, send_email=True):
-    new_user = User.objects.create_user(name, email, password)
-    new_user.is_active = False
-    new_user.save()
+    with stage('create_inactive_user'):
+        new_user = User.objects.create_user(name, email, password,
+                                            is_active=False)
 
-    registration_profile = self.create_profile(new_user)
+        registration_profile = self.create_profile(new_user)
 
-    if send_email:
-        registration_profile.send_activation_email(site)
+        if send_email:
+            with stage('activation_email'):
+                if getattr(settings, 'USERNAMELESS_EMAIL_OUTBOX', True):
+                    queue_activation_email(registration_profile, site)
+                else:
+                    registration_profile.send_activation_email(site)
 
     return new_user
 
 
 def create_profile(self, user):
-    salt = hashlib.sha1(str(random.random())).hexdigest()[:5]
-    activation_key = hashlib.sha1(salt+user.email).hexdigest()
-    return self.create(user=user, activation_key=activation_key)
+    # 40 random hex digits, the shape registration expects of a SHA1 key
+    activation_key = binascii.hexlify(os.urandom(20)).decode('ascii')
+    with stage('create_profile'):
+        return self.create(user=user, activation_key=activation_key)
+
+
+SHA1_RE = re.compile('^[a-f0-9]{40}$')
+
+
+@transaction.commit_on_success
+def activate_user(self, activation_key):
+    """
+    Activates the user of ``activation_key`` with one lookup and
+    conditional UPDATEs instead of saving the user and profile rows in
+    full. Returns the user, or ``False`` if the key is unknown, expired
+    or was already used, e.g. by a double-click racing this one.
+    """
+    if not SHA1_RE.search(activation_key):
+        return False
+    try:
+        profile = self.select_related('user').get(
+            activation_key=activation_key)
+    except self.model.DoesNotExist:
+        return False
+    if profile.activation_key_expired():
+        return False
+    activated = User.objects.filter(pk=profile.user_id,
+                                    is_active=False).update(is_active=True)
+    if not activated:
+        return False
+    self.filter(pk=profile.pk).update(activation_key=self.model.ACTIVATED)
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.bump(profile.user_id)
+    user = profile.user
+    user.is_active = True
+    return user
+
+
+def create_activation_key_index(sender, **kwargs):
+    """
+    Indexes ``RegistrationProfile.activation_key``, which
+    django-registration leaves unindexed although activation looks
+    profiles up by it.
+    """
+    from django.db import connections
+    from registration.models import RegistrationProfile
+    connection = connections[kwargs.get('db', 'default')]
+    if connection.vendor not in ('postgresql', 'sqlite'):
+        return
+    table = RegistrationProfile._meta.db_table
+    connection.cursor().execute(
+        'CREATE INDEX IF NOT EXISTS %s_activation_key '
+        'ON %s (activation_key)' % (table, table))
+
+
+# Without AppConfig.ready() the receivers are connected once the app
+# cache has loaded django-registration's models, see connect_when_ready.
+from .apps import HAS_APP_CONFIG  # noqa
+if not HAS_APP_CONFIG:
+    from .receivers import connect_when_ready
+    connect_when_ready()
@@ -0,0 +1,123 @@
+"""
+A permission cache shared across requests.
+
+Entries hold a user's permission sets and are keyed by the user id and
+version tokens of the user, of the groups the user belongs to and of
+the permission table as a whole. Signal receivers in
+``usernameless.receivers`` replace those tokens whenever something the
+permissions depend on changes, which orphans stale entries instead of
+having to find and delete them. It is configured with:
+
+``USERNAMELESS_PERMISSION_CACHE``
+    Name of the Django cache to use, ``'default'`` by default. Use a
+    cache shared by all processes so invalidations reach every one.
+
+``USERNAMELESS_PERMISSION_CACHE_TIMEOUT``
+    Seconds an entry is kept, ``300`` by default.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import get_cache
+
+# version tokens must outlive the entries keyed by them
+VERSION_TIMEOUT = 60 * 60 * 24 * 30
+
+
+class PermissionCache(object):
+    def __init__(self, cache_alias='default', timeout=300,
+                 prefix='usernameless:perms'):
+        self.cache = get_cache(cache_alias)
+        self.timeout = timeout
+        self.prefix = prefix
+
+    def _version_key(self, kind, pk=None):
+        if pk is None:
+            return '%s:v:%s' % (self.prefix, kind)
+        return '%s:v:%s:%s' % (self.prefix, kind, pk)
+
+    def _entry_key(self, user_id, user_version, global_version):
+        return '%s:%s:%s:%s' % (self.prefix, user_id, user_version,
+                                global_version)
+
+    def versions(self, keys):
+        """
+        Returns the version tokens for ``keys``, creating missing ones.
+        """
+        versions = self.cache.get_many(keys)
+        for key in keys:
+            if key not in versions:
+                self.cache.add(key, uuid.uuid4().hex, VERSION_TIMEOUT)
+                versions[key] = self.cache.get(key)
+        return versions
+
+    def user_versions(self, user_id):
+        """
+        Returns the (user, global) version tokens for ``user_id``,
+        which must be read before the permissions are computed.
+        """
+        user_key = self._version_key('user', user_id)
+        global_key = self._version_key('global')
+        versions = self.versions([user_key, global_key])
+        return versions[user_key], versions[global_key]
+
+    def group_versions(self, group_ids):
+        keys = dict((self._version_key('group', pk), pk) for pk in group_ids)
+        return dict((keys[key], version)
+                    for key, version in self.versions(list(keys)).items())
+
+    def get(self, user_id):
+        """
+        Returns ``(all_permissions, group_permissions)`` for
+        ``user_id``, or ``None`` when there is no valid entry.
+        """
+        entry = self.cache.get(self._entry_key(user_id,
+                                               *self.user_versions(user_id)))
+        if entry is None:
+            return None
+        groups, all_perms, group_perms = entry
+        if groups and self.group_versions(groups) != groups:
+            return None
+        return all_perms, group_perms
+
+    def set(self, user_id, versions, groups, all_perms, group_perms):
+        """
+        Stores permissions computed after reading ``versions`` (from
+        ``user_versions``) and ``groups`` (from ``group_versions``).
+        """
+        self.cache.set(self._entry_key(user_id, *versions),
+                       (groups, all_perms, group_perms),
+                       self.timeout)
+
+    def _bump(self, key):
+        self.cache.set(key, uuid.uuid4().hex, VERSION_TIMEOUT)
+
+    def bump_user(self, user_id):
+        self._bump(self._version_key('user', user_id))
+
+    def bump_users(self, user_ids):
+        self.cache.set_many(dict((self._version_key('user', pk),
+                                  uuid.uuid4().hex) for pk in user_ids),
+                            VERSION_TIMEOUT)
+
+    def bump_group(self, group_id):
+        self._bump(self._version_key('group', group_id))
+
+    def bump_global(self):
+        self._bump(self._version_key('global'))
+
+
+_cache = None
+
+
+def get_permission_cache():
+    """ Returns the permission cache configured by the settings. """
+    global _cache
+    if _cache is None:
+        _cache = PermissionCache(
+            cache_alias=getattr(settings, 'USERNAMELESS_PERMISSION_CACHE',
+                                'default'),
+            timeout=getattr(settings, 'USERNAMELESS_PERMISSION_CACHE_TIMEOUT',
+                            300))
+    return _cache
@@ -1,15 +1,190 @@
-from .models import create_inactive_user, create_profile
+"""
+Signal receivers keeping usernameless' caches and search index in sync,
+and the patches of django-registration's manager.
+
+Importing this module has no side effects; ``connect()`` wires
+everything up once the models are loaded, see ``usernameless.apps``.
+"""
+
+import sys
+
+from django.db import router
+from django.db.models.signals import (post_save, post_delete, post_syncdb,
+                                      m2m_changed, class_prepared)
+from django.utils.importlib import import_module
+
+from .backends import get_negative_cache
+from .permissions import get_permission_cache
+from .search import SQLiteFTSBackend, get_search_backend
+from .signals import users_updated
+from .snapshots import get_user_cache
 
 
 def patch():
     """ Apply patch for django-registration's manager methods. """
-    from registration import models
+    # import_module returns the module even while it is being imported,
+    # unlike ``from registration import models`` on Python 2
+    models = import_module('registration.models')
+    from .models import (activate_user, create_activation_key_index,
+                         create_inactive_user, create_profile)
     setattr(models.RegistrationManager,
             'create_inactive_user',
             create_inactive_user)
     setattr(models.RegistrationManager,
             'create_profile',
             create_profile)
+    setattr(models.RegistrationManager,
+            'activate_user',
+            activate_user)
+    post_syncdb.connect(create_activation_key_index, sender=models,
+                        dispatch_uid='usernameless.activation_key_index')
+
+
+def forget_unknown_email(sender, instance, **kwargs):
+    """ Let a new account log in before its email expires from the cache. """
+    get_negative_cache().delete(instance.normalized_email)
+
+
+def index_user(sender, instance, using=None, **kwargs):
+    get_search_backend(sender).index(instance, using=using)
+
+
+def unindex_user(sender, instance, using=None, **kwargs):
+    get_search_backend(sender).remove(instance.pk, using=using)
+
+
+def create_search_index(sender, db=None, **kwargs):
+    """
+    Creates the SQLite FTS table along with the user table. PostgreSQL's
+    trigram indexes need ``pg_trgm`` and are left to
+    ``rebuild_search_index``.
+    """
+    from .models import User
+    backend = get_search_backend(User)
+    if (isinstance(backend, SQLiteFTSBackend) and
+            router.allow_syncdb(db, User)):
+        backend.setup(using=db)
+
+
+def invalidate_user_permissions(sender, instance, **kwargs):
+    get_permission_cache().bump_user(instance.pk)
+
+
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.bump(instance.pk)
+
+
+def invalidate_updated_users(sender, ids, **kwargs):
+    get_permission_cache().bump_users(ids)
+    user_cache = get_user_cache()
+    if user_cache is not None:
+        user_cache.bump_many(ids)
+
+
+def invalidate_group_permissions(sender, instance, **kwargs):
+    get_permission_cache().bump_group(instance.pk)
+
+
+def invalidate_all_permissions(sender, **kwargs):
+    get_permission_cache().bump_global()
+
+
+def _invalidate_m2m(action, instance, reverse, pk_set,
+                    bump_forward, bump_reverse, bump_cleared):
+    """
+    Bumps the versions affected by an m2m change: the changed object
+    for forward changes, the related objects for reverse ones, and
+    ``bump_cleared`` when the relation is cleared from the reverse side,
+    which doesn't say which objects were affected.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_forward(instance.pk)
+    elif pk_set:
+        for pk in pk_set:
+            bump_reverse(pk)
+    else:
+        bump_cleared(instance.pk)
+
+
+def invalidate_group_membership(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    cache = get_permission_cache()
+    _invalidate_m2m(action, instance, reverse, pk_set,
+                    cache.bump_user, cache.bump_user, cache.bump_group)
+
+
+def invalidate_user_permission_grants(sender, instance, action, reverse,
+                                      pk_set, **kwargs):
+    cache = get_permission_cache()
+    _invalidate_m2m(action, instance, reverse, pk_set,
+                    cache.bump_user, cache.bump_user,
+                    lambda pk: cache.bump_global())
+
+
+def invalidate_group_permission_grants(sender, instance, action, reverse,
+                                       pk_set, **kwargs):
+    cache = get_permission_cache()
+    _invalidate_m2m(action, instance, reverse, pk_set,
+                    cache.bump_group, cache.bump_group,
+                    lambda pk: cache.bump_global())
+
+
+def connect():
+    """
+    Patches django-registration and connects the receivers. Safe to
+    call more than once.
+    """
+    from django.contrib.auth.models import Group, Permission
+    from .models import User
+    models = import_module('usernameless.models')
+
+    patch()
+    receivers = [
+        (post_save, User, forget_unknown_email),
+        (post_save, User, index_user),
+        (post_delete, User, unindex_user),
+        (post_syncdb, models, create_search_index),
+        (post_save, User, invalidate_user_permissions),
+        (post_delete, User, invalidate_user_permissions),
+        (post_save, User, invalidate_cached_user),
+        (post_delete, User, invalidate_cached_user),
+        (users_updated, User, invalidate_updated_users),
+        (post_save, Group, invalidate_group_permissions),
+        (post_delete, Group, invalidate_group_permissions),
+        (post_save, Permission, invalidate_all_permissions),
+        (post_delete, Permission, invalidate_all_permissions),
+        (m2m_changed, User.groups.through, invalidate_group_membership),
+        (m2m_changed, User.user_permissions.through,
+         invalidate_user_permission_grants),
+        (m2m_changed, Group.permissions.through,
+         invalidate_group_permission_grants),
+    ]
+    for signal, sender, func in receivers:
+        signal.connect(func, sender=sender, weak=False,
+                       dispatch_uid='usernameless.%s' % func.__name__)
+
+
+def connect_on_prepared(sender, **kwargs):
+    if (sender._meta.app_label == 'registration' and
+            sender._meta.object_name == 'RegistrationProfile'):
+        class_prepared.disconnect(dispatch_uid='usernameless.connect')
+        connect()
 
 
-patch()
+def connect_when_ready():
+    """
+    Calls ``connect()`` once django-registration's models are loaded,
+    for Django versions without ``AppConfig.ready()``. Importing them
+    from ``usernameless.models`` would look the user model up before
+    the app cache knows this app.
+    """
+    registration_models = sys.modules.get('registration.models')
+    if hasattr(registration_models, 'RegistrationProfile'):
+        connect()
+    else:
+        class_prepared.connect(connect_on_prepared, weak=False,
+                               dispatch_uid='usernameless.connect')
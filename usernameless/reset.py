@@ -0,0 +1,111 @@
+"""
+Delivery of password reset emails.
+
+``PasswordResetForm.save()`` hands its users to ``send_password_reset``,
+which renders the emails with templates loaded once per call, queues
+them in the outbox (or sends them over one connection when the outbox
+is disabled) and then ignores further resets of the same addresses for
+a while, so bursts of requests for an address cost neither queries nor
+emails. It is configured with:
+
+``USERNAMELESS_RESET_SUPPRESS_SECONDS``
+    Seconds during which repeated resets of an address are ignored,
+    ``300`` by default, ``0`` disables it.
+
+``USERNAMELESS_RESET_CACHE``
+    Name of a Django cache shared between processes. By default each
+    process remembers the addresses itself.
+"""
+
+import threading
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.template import Context, loader
+from django.utils.http import int_to_base36
+
+from .caches import TTLCache
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_suppression_cache():
+    """ Returns the cache of recently reset addresses. """
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TTLCache(
+                    maxsize=getattr(settings,
+                                    'USERNAMELESS_RESET_SUPPRESS_SIZE', 10000),
+                    ttl=getattr(settings,
+                                'USERNAMELESS_RESET_SUPPRESS_SECONDS', 300),
+                    cache_alias=getattr(settings, 'USERNAMELESS_RESET_CACHE',
+                                        None),
+                    prefix='usernameless:reset')
+    return _cache
+
+
+def clear():
+    """ Drops the suppression state of this process. """
+    global _cache
+    with _cache_lock:
+        _cache = None
+
+
+def is_suppressed(email_key):
+    """
+    Returns whether a reset email went to ``email_key``, a normalized
+    email, within the suppression window.
+    """
+    cache = get_suppression_cache()
+    return bool(cache.ttl and cache.get(email_key))
+
+
+def render_reset_emails(users, domain, site_name, use_https=False,
+                        token_generator=default_token_generator,
+                        subject_template_name='registration/password_reset_subject.txt',
+                        email_template_name='registration/password_reset_email.html'):
+    """
+    Yields ``(subject, body, email)`` for each of ``users``, with the
+    same context as Django's ``PasswordResetForm.save()``.
+    """
+    subject_template = loader.get_template(subject_template_name)
+    email_template = loader.get_template(email_template_name)
+    for user in users:
+        context = Context({
+            'email': user.email,
+            'domain': domain,
+            'site_name': site_name,
+            'uid': int_to_base36(user.pk),
+            'user': user,
+            'token': token_generator.make_token(user),
+            'protocol': use_https and 'https' or 'http',
+        })
+        # Email subject *must not* contain newlines
+        subject = ''.join(subject_template.render(context).splitlines())
+        yield subject, email_template.render(context), user.email
+
+
+def send_password_reset(users, from_email=None, **kwargs):
+    """
+    Delivers the reset emails of ``users``, see
+    ``render_reset_emails()`` for the keyword arguments, and starts
+    their suppression window.
+    """
+    from .models import OutboxMessage, UserManager
+    emails = list(render_reset_emails(users, **kwargs))
+    if getattr(settings, 'USERNAMELESS_EMAIL_OUTBOX', True):
+        OutboxMessage.objects.enqueue_many(
+            [(subject, body, [email]) for subject, body, email in emails],
+            from_email)
+    else:
+        get_connection().send_messages(
+            [EmailMessage(subject, body, from_email, [email])
+             for subject, body, email in emails])
+    cache = get_suppression_cache()
+    if cache.ttl:
+        for user in users:
+            cache.set(UserManager.email_key(user.email), True)
@@ -0,0 +1,152 @@
+"""
+Routes read-only ``User`` and ``RegistrationProfile`` queries to read
+replicas, sending everything else about them to the primary.
+
+Once such a write happened, the rest of the request and, through a
+cookie set by ``ReplicaStickinessMiddleware``, the client's following
+requests for a while read from the primary too, so users see their own
+registration, activation or password change. Unsafe requests (POST
+etc.) read from the primary from the start. It is configured with:
+
+``USERNAMELESS_REPLICAS``
+    Aliases of the replica databases. Reads are spread randomly over
+    them; no replicas means everything goes to the primary.
+
+``USERNAMELESS_PRIMARY``
+    Alias of the primary database, ``'default'`` by default.
+
+``USERNAMELESS_REPLICA_STICKY_SECONDS``
+    Seconds a client reads from the primary after a write, ``15`` by
+    default. Keep it above the replication lag.
+
+``USERNAMELESS_REPLICA_COOKIE``
+    Name of that cookie, ``'usernameless_primary'`` by default.
+
+Enable it with::
+
+    DATABASE_ROUTERS = ['usernameless.routers.ReplicaRouter']
+    MIDDLEWARE_CLASSES += ('usernameless.routers.ReplicaStickinessMiddleware',)
+"""
+
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+ROUTED_MODELS = ('usernameless.user', 'registration.registrationprofile')
+
+_local = threading.local()
+
+
+def _label(model):
+    return '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+
+
+def get_primary():
+    return getattr(settings, 'USERNAMELESS_PRIMARY', 'default')
+
+
+def get_replicas():
+    return getattr(settings, 'USERNAMELESS_REPLICAS', [])
+
+
+def pin_primary():
+    """ Sends this thread's reads to the primary until ``unpin()``. """
+    _local.pinned = True
+
+
+def unpin():
+    _local.pinned = False
+    _local.wrote = False
+
+
+def is_pinned():
+    return getattr(_local, 'pinned', False)
+
+
+def wrote():
+    """ Returns whether a routed write happened since ``unpin()``. """
+    return getattr(_local, 'wrote', False)
+
+
+@contextmanager
+def use_primary():
+    """
+    Reads from the primary within the block, e.g. in management
+    commands that read what they just wrote.
+    """
+    pinned = is_pinned()
+    pin_primary()
+    try:
+        yield
+    finally:
+        _local.pinned = pinned
+
+
+class ReplicaRouter(object):
+    def db_for_read(self, model, **hints):
+        if _label(model) not in ROUTED_MODELS:
+            return None
+        replicas = get_replicas()
+        if not replicas or is_pinned():
+            return get_primary()
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if _label(model) not in ROUTED_MODELS:
+            return None
+        # read what was just written from the primary
+        _local.wrote = True
+        pin_primary()
+        return get_primary()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = [get_primary()] + list(get_replicas())
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_syncdb(self, db, model):
+        if _label(model) in ROUTED_MODELS and db in get_replicas():
+            return False
+        return None
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'USERNAMELESS_REPLICA_STICKY_SECONDS', 15)
+
+
+class ReplicaStickinessMiddleware(object):
+    """
+    Pins requests to the primary while the client's stickiness cookie
+    is valid and for unsafe methods, and sets the cookie after writes.
+    A cookie ending later than a fresh one would is ignored, so clients
+    can't pin themselves to the primary for good.
+    """
+    def cookie_name(self):
+        return getattr(settings, 'USERNAMELESS_REPLICA_COOKIE',
+                       'usernameless_primary')
+
+    def process_request(self, request):
+        unpin()
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE'):
+            pin_primary()
+            return
+        try:
+            until = float(request.COOKIES.get(self.cookie_name(), 0))
+        except ValueError:
+            return
+        now = time.time()
+        if now < until <= now + get_sticky_seconds():
+            pin_primary()
+
+    def process_response(self, request, response):
+        if wrote():
+            seconds = get_sticky_seconds()
+            response.set_cookie(self.cookie_name(),
+                                '%d' % (time.time() + seconds),
+                                max_age=seconds, httponly=True)
+        unpin()
+        return response
@@ -0,0 +1,283 @@
+"""
+Search index for users by partial name or email.
+
+Searching ``LIKE '%term%'`` over the user table can't use any index,
+so lookups go through a search backend instead:
+
+``PostgresTrigramBackend``
+    Trigram GIN indexes (``pg_trgm``) on the user table itself, which
+    PostgreSQL keeps up to date.
+
+``SQLiteFTSBackend``
+    An FTS5 table kept in sync by the receivers in
+    ``usernameless.receivers``. Until the table exists searches scan
+    the user table.
+
+``ScanBackend``
+    Case-insensitive substring matches on the user table itself, like
+    the stock admin search, for databases without either.
+
+``NgramBackend``
+    A pure-Python trigram index held in each process, loaded from the
+    whole user table and blind to other processes' changes until
+    ``rebuild()``. Only used when configured, for small single-process
+    sites.
+
+The backend is picked from the database vendor unless
+``USERNAMELESS_SEARCH_BACKEND`` holds the dotted path of one. Run the
+``rebuild_search_index`` command after installing to create the
+indexes and fill them from existing users; ``syncdb`` creates the FTS
+table too. Indexes are only ever created there, as DDL commits the open
+transaction on SQLite.
+
+Index writes go to the database the user was written to, searches to
+the one ``router.db_for_read()`` picks.
+"""
+
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+from django.utils.importlib import import_module
+
+from .utils import chunked
+
+
+class BaseSearchBackend(object):
+    def __init__(self, model):
+        self.model = model
+        self.table = model._meta.db_table
+
+    def read_db(self):
+        return router.db_for_read(self.model)
+
+    def write_db(self, using=None):
+        return using or router.db_for_write(self.model)
+
+    def cursor(self, using):
+        return connections[using].cursor()
+
+    def setup(self, using=None):
+        """ Creates whatever the backend needs in the database. """
+
+    def index(self, user, using=None):
+        """ Adds or refreshes ``user`` in the index. """
+
+    def remove(self, user_id, using=None):
+        """ Drops the user ``user_id`` from the index. """
+
+    def rebuild(self, batch_size=1000, using=None):
+        """ Re-indexes every user, ``batch_size`` users at a time. """
+        db = self.write_db(using)
+        users = self.model._default_manager.using(db).only(
+            'pk', 'name', 'normalized_email').order_by('pk')
+        for chunk in chunked(users.iterator(), batch_size):
+            with transaction.commit_on_success(using=db):
+                for user in chunk:
+                    self.index(user, using=db)
+
+    def search(self, term, limit):
+        """ Returns the ids of up to ``limit`` users matching ``term``. """
+        raise NotImplementedError
+
+
+def like_pattern(term):
+    term = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return '%' + term + '%'
+
+
+class PostgresTrigramBackend(BaseSearchBackend):
+    def setup(self, using=None):
+        cursor = self.cursor(self.write_db(using))
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in ('name', 'normalized_email'):
+            cursor.execute('CREATE INDEX IF NOT EXISTS %s_%s_trgm ON %s '
+                           'USING gin (%s gin_trgm_ops)'
+                           % (self.table, column, self.table, column))
+
+    def rebuild(self, batch_size=1000, using=None):
+        # the indexes live on the user table itself
+        pass
+
+    def search(self, term, limit):
+        cursor = self.cursor(self.read_db())
+        cursor.execute('SELECT id FROM %s '
+                       'WHERE name ILIKE %%s OR normalized_email LIKE %%s '
+                       'ORDER BY similarity(name, %%s) DESC, id '
+                       'LIMIT %%s' % self.table,
+                       [like_pattern(term), like_pattern(term.lower()),
+                        term, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class ScanBackend(BaseSearchBackend):
+    def search(self, term, limit):
+        # every word must be part of the name or email
+        users = self.model._default_manager.using(self.read_db())
+        for word in term.split():
+            users = users.filter(Q(name__icontains=word) |
+                                 Q(normalized_email__contains=word.lower()))
+        return list(users.order_by('pk').values_list('pk', flat=True)[:limit])
+
+
+class SQLiteFTSBackend(ScanBackend):
+    def __init__(self, model):
+        super(SQLiteFTSBackend, self).__init__(model)
+        self.fts_table = '%s_fts' % self.table
+        self._ready = set()
+
+    def setup(self, using=None):
+        db = self.write_db(using)
+        self.cursor(db).execute('CREATE VIRTUAL TABLE IF NOT EXISTS %s '
+                                'USING fts5(name, email)' % self.fts_table)
+        self._ready.add(db)
+
+    def is_ready(self, using):
+        """
+        Returns whether the FTS table exists in ``using``, asking the
+        database until it does.
+        """
+        if using not in self._ready:
+            cursor = self.cursor(using)
+            cursor.execute("SELECT 1 FROM sqlite_master "
+                           "WHERE type = 'table' AND name = %s",
+                           [self.fts_table])
+            if cursor.fetchone() is None:
+                return False
+            self._ready.add(using)
+        return True
+
+    def index(self, user, using=None):
+        db = self.write_db(using)
+        if self.is_ready(db):
+            self.cursor(db).execute(
+                'INSERT OR REPLACE INTO %s (rowid, name, email) '
+                'VALUES (%%s, %%s, %%s)' % self.fts_table,
+                [user.pk, user.name, user.normalized_email])
+
+    def remove(self, user_id, using=None):
+        db = self.write_db(using)
+        if self.is_ready(db):
+            self.cursor(db).execute(
+                'DELETE FROM %s WHERE rowid = %%s' % self.fts_table,
+                [user_id])
+
+    def search(self, term, limit):
+        # every word must prefix-match some token of the name or email
+        query = ' '.join('"%s"*' % word.replace('"', '""')
+                         for word in term.split())
+        if not query:
+            return []
+        db = self.read_db()
+        if not self.is_ready(db):
+            return super(SQLiteFTSBackend, self).search(term, limit)
+        cursor = self.cursor(db)
+        cursor.execute('SELECT rowid FROM %(table)s '
+                       'WHERE %(table)s MATCH %%s '
+                       'ORDER BY rank LIMIT %%s' % {'table': self.fts_table},
+                       [query, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+class NgramBackend(BaseSearchBackend):
+    """
+    Keeps a trigram index of the users in memory, built from the
+    database on the first search. Changes made by other processes only
+    show up after ``rebuild()``.
+    """
+    def __init__(self, model):
+        super(NgramBackend, self).__init__(model)
+        self._lock = threading.Lock()
+        self._texts = None
+        self._postings = defaultdict(set)
+
+    def _add(self, user_id, text):
+        self._texts[user_id] = text
+        for gram in trigrams(text):
+            self._postings[gram].add(user_id)
+
+    def _discard(self, user_id):
+        text = self._texts.pop(user_id, None)
+        if text is not None:
+            for gram in trigrams(text):
+                self._postings[gram].discard(user_id)
+
+    def rebuild(self, batch_size=1000, using=None):
+        rows = (self.model._default_manager.using(using or self.read_db())
+                    .order_by('pk')
+                    .values_list('pk', 'name', 'normalized_email'))
+        with self._lock:
+            self._texts, self._postings = {}, defaultdict(set)
+            for pk, name, email in rows.iterator():
+                self._add(pk, u'%s %s' % (name.lower(), email or ''))
+
+    def index(self, user, using=None):
+        with self._lock:
+            if self._texts is not None:
+                self._discard(user.pk)
+                self._add(user.pk, u'%s %s' % (user.name.lower(),
+                                               user.normalized_email or ''))
+
+    def remove(self, user_id, using=None):
+        with self._lock:
+            if self._texts is not None:
+                self._discard(user_id)
+
+    def search(self, term, limit):
+        if self._texts is None:
+            self.rebuild()
+        words = term.lower().split()
+        with self._lock:
+            candidates = None
+            for word in words:
+                grams = trigrams(word)
+                if not grams:
+                    continue
+                ids = set.intersection(*[self._postings.get(g, set())
+                                         for g in grams])
+                candidates = ids if candidates is None else candidates & ids
+            if candidates is None:
+                candidates = self._texts.keys()
+            matches = sorted(pk for pk in candidates
+                             if all(w in self._texts[pk] for w in words))
+        return matches[:limit]
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_search_backend(model=None):
+    """ Returns the search backend for the user model. """
+    if model is None:
+        from django.contrib.auth import get_user_model
+        model = get_user_model()
+    key = (model, getattr(settings, 'USERNAMELESS_SEARCH_BACKEND', None))
+    if key not in _backends:
+        with _backends_lock:
+            if key not in _backends:
+                _backends[key] = _create_backend(model)
+    return _backends[key]
+
+
+def _create_backend(model):
+    path = getattr(settings, 'USERNAMELESS_SEARCH_BACKEND', None)
+    if path:
+        module, name = path.rsplit('.', 1)
+        return getattr(import_module(module), name)(model)
+    connection = connections[router.db_for_read(model)]
+    if connection.vendor == 'postgresql':
+        return PostgresTrigramBackend(model)
+    if connection.vendor == 'sqlite':
+        # a SELECT, unlike DDL or PRAGMA, leaves the transaction open
+        cursor = connection.cursor()
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return SQLiteFTSBackend(model)
+    return ScanBackend(model)
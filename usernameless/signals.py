@@ -0,0 +1,10 @@
+"""
+Signals sent by usernameless.
+"""
+
+from django.dispatch import Signal
+
+# Sent once per batch by the bulk ``UserManager`` methods, which skip
+# the per-user ``post_save`` and ``post_delete`` signals.
+users_updated = Signal(providing_args=['ids', 'values'])
+users_deleted = Signal(providing_args=['ids'])
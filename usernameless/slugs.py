@@ -0,0 +1,50 @@
+"""
+In-memory allocation of unique user slugs, following AutoSlugField's
+``<slug>-<index>`` naming so existing URLs keep their shape.
+"""
+
+from autoslug.utils import crop_slug
+
+
+def suffix_slug(field, slug, index):
+    """
+    Appends ``index`` to ``slug``, cropping the slug so the result
+    still fits in ``field.max_length``.
+    """
+    tail = '%s%d' % (field.index_sep, index)
+    if field.max_length and field.max_length < len(slug) + len(tail):
+        slug = slug[:field.max_length - len(tail)]
+    return slug + tail
+
+
+class SlugAllocator(object):
+    """
+    Hands out unique slugs for a slug field against a set of slugs
+    that are already taken, without touching the database.
+    """
+    def __init__(self, field, taken=()):
+        self.field = field
+        self.taken = set(taken)
+        self._next_index = {}
+
+    def base_slug(self, value, default='user'):
+        slug = self.field.slugify(value or '') or default
+        return crop_slug(self.field, slug)
+
+    def allocate(self, value):
+        base = self.base_slug(value)
+        index = self._next_index.get(base, 1)
+        slug = base if index == 1 else suffix_slug(self.field, base, index)
+        while slug in self.taken:
+            index += 1
+            slug = suffix_slug(self.field, base, index)
+        self._next_index[base] = index + 1
+        self.taken.add(slug)
+        return slug
+
+    def last_indexes(self):
+        """
+        Returns the highest index allocated so far for each base slug.
+        """
+        return dict((base, index - 1)
+                    for base, index in self._next_index.items())
@@ -0,0 +1,175 @@
+"""
+A cache of authenticated users for ``backend.get_user()``.
+
+Resolving ``request.user`` normally fetches the user row on every
+request. With the cache enabled, ``EmailBackend.get_user`` returns a
+``LazyUser`` built from a compact snapshot of the fields most pages
+need, and the full row is only fetched when anything else is used.
+
+Each entry is stored next to a version token of the user, replaced by
+the receivers in ``usernameless.receivers`` whenever the user is saved
+(which includes password changes) or deleted, and by the manager
+methods updating users in bulk. An entry whose version doesn't match
+is ignored. It is configured with:
+
+``USERNAMELESS_USER_CACHE``
+    Name of the Django cache to use. The cache is disabled unless this
+    is set; use a cache shared by all processes.
+
+``USERNAMELESS_USER_CACHE_TIMEOUT``
+    Seconds an entry is kept, ``300`` by default.
+"""
+
+import uuid
+
+from django.conf import settings
+from django.core.cache import get_cache
+from django.utils.functional import LazyObject, empty
+
+from .permissions import VERSION_TIMEOUT
+
+SNAPSHOT_FIELDS = ('id', 'email', 'name', 'slug', 'is_active', 'is_staff')
+
+
+class LazyUser(LazyObject):
+    """
+    Answers the snapshot fields of a user from the cache and turns
+    into the full model instance, fetched once, on any other access.
+    """
+    def __init__(self, model, snapshot, using=None):
+        super(LazyUser, self).__init__()
+        self.__dict__['_model'] = model
+        self.__dict__['_snapshot'] = snapshot
+        self.__dict__['_using'] = using
+
+    def _setup(self):
+        self._wrapped = self._model._default_manager.db_manager(
+            self._using).get(pk=self._snapshot['id'])
+
+    def __getattr__(self, name):
+        if self._wrapped is empty and name in self._snapshot:
+            return self._snapshot[name]
+        if self._wrapped is empty:
+            self._setup()
+        return getattr(self._wrapped, name)
+
+    @property
+    def pk(self):
+        return self._snapshot['id']
+
+    @property
+    def __class__(self):
+        if self._wrapped is empty:
+            return self._model
+        return self._wrapped.__class__
+
+    def is_anonymous(self):
+        return False
+
+    def is_authenticated(self):
+        return True
+
+    def get_full_name(self):
+        return self.name
+
+    def get_short_name(self):
+        return self.email
+
+    def __eq__(self, other):
+        return (isinstance(other, self._model) and
+                other.pk == self._snapshot['id'])
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._snapshot['id'])
+
+    def __unicode__(self):
+        return self.email
+
+    def __str__(self):
+        return self.email.encode('utf-8')
+
+
+class UserCache(object):
+    def __init__(self, cache_alias='default', timeout=300,
+                 prefix='usernameless:user'):
+        self.alias = cache_alias
+        self.cache = get_cache(cache_alias)
+        self.timeout = timeout
+        self.prefix = prefix
+
+    def _keys(self, user_id):
+        return ('%s:%s' % (self.prefix, user_id),
+                '%s:v:%s' % (self.prefix, user_id))
+
+    def get(self, user_id):
+        """
+        Returns ``(snapshot, version)`` for ``user_id``. ``snapshot`` is
+        ``None`` unless a current entry exists, in which case
+        ``version`` must be passed to ``set()`` after fetching the user.
+        """
+        entry_key, version_key = self._keys(user_id)
+        found = self.cache.get_many([entry_key, version_key])
+        version = found.get(version_key)
+        if version is None:
+            self.cache.add(version_key, uuid.uuid4().hex, VERSION_TIMEOUT)
+            return None, self.cache.get(version_key)
+        entry = found.get(entry_key)
+        if entry is None or entry[0] != version:
+            return None, version
+        return entry[1], version
+
+    def set(self, user, version):
+        """
+        Stores a snapshot of ``user``, fetched after ``version`` was
+        read, so that a concurrent bump leaves the entry stale.
+        """
+        snapshot = dict((name, getattr(user, name))
+                        for name in SNAPSHOT_FIELDS)
+        self.cache.set(self._keys(user.pk)[0], (version, snapshot),
+                       self.timeout)
+
+    def bump(self, user_id):
+        self.cache.set(self._keys(user_id)[1], uuid.uuid4().hex,
+                       VERSION_TIMEOUT)
+
+    def bump_many(self, user_ids):
+        self.cache.set_many(dict((self._keys(pk)[1], uuid.uuid4().hex)
+                                 for pk in user_ids), VERSION_TIMEOUT)
+
+    def get_user(self, model, user_id, using=None):
+        """
+        Returns a ``LazyUser`` for ``user_id``, fetching and caching
+        the user on a miss, or ``None`` if it doesn't exist.
+        """
+        snapshot, version = self.get(user_id)
+        if snapshot is not None:
+            return LazyUser(model, snapshot, using)
+        try:
+            user = model._default_manager.db_manager(using).get(pk=user_id)
+        except model.DoesNotExist:
+            return None
+        if version is not None:
+            self.set(user, version)
+        return user
+
+
+_cache = None
+
+
+def get_user_cache():
+    """
+    Returns the user cache configured by the settings, or ``None``
+    when it is disabled.
+    """
+    global _cache
+    alias = getattr(settings, 'USERNAMELESS_USER_CACHE', None)
+    if not alias:
+        return None
+    if _cache is None or _cache.alias != alias:
+        _cache = UserCache(
+            cache_alias=alias,
+            timeout=getattr(settings, 'USERNAMELESS_USER_CACHE_TIMEOUT', 300))
+    return _cache
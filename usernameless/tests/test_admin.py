@@ -0,0 +1,146 @@
+from django.contrib import admin
+from django.contrib.admin.models import LogEntry
+from django.core.urlresolvers import reverse
+from django.test import TestCase
+from django.test.client import RequestFactory
+
+from ..admin import UserAdmin, UserChangeForm, UserCreationForm
+from ..changelist import LargeTableChangeList, EstimatedCountPaginator
+from ..models import User
+from ..signals import users_updated
+
+
+class TestLargeTableChangeList(TestCase):
+
+    def setUp(self):
+        self.model_admin = UserAdmin(User, admin.site)
+        self.model_admin.large_table = True
+        self.model_admin.list_per_page = 2
+        for i in range(5):
+            User.objects.create_user('user', 'user%d@wonderland.com' % i,
+                                     'secret')
+
+    def changelist(self, **params):
+        request = RequestFactory().get('/', params)
+        model_admin = self.model_admin
+        return LargeTableChangeList(
+            request, User, model_admin.list_display,
+            model_admin.list_display_links,
+            model_admin.get_list_filter(request), model_admin.date_hierarchy,
+            model_admin.search_fields, model_admin.list_select_related,
+            model_admin.list_per_page, model_admin.list_max_show_all,
+            model_admin.list_editable, model_admin)
+
+    def test_keyset_pages(self):
+        seen = []
+        params = {}
+        while True:
+            cl = self.changelist(**params)
+            seen.extend(user.pk for user in cl.result_list)
+            if cl.next_seek is None:
+                break
+            params = {'after': cl.next_seek}
+        self.assertEqual(seen, list(User.objects.order_by('name', 'pk')
+                                                .values_list('pk', flat=True)))
+        self.assertEqual(cl.result_count, 5)
+
+    def test_email_prefix_search(self):
+        cl = self.changelist(q='USER3@')
+        self.assertEqual([u.email for u in cl.result_list],
+                         ['user3@wonderland.com'])
+
+    def test_groups_filter_dropped(self):
+        request = RequestFactory().get('/')
+        self.failIf('groups' in self.model_admin.get_list_filter(request))
+
+    def test_paginator_falls_back_to_count(self):
+        paginator = EstimatedCountPaginator(User.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
+
+    def test_impersonate_url(self):
+        user = User.objects.all()[0]
+        self.assertEqual(self.model_admin.impersonate_url(user.pk),
+                         reverse('impersonate-start', args=(user.pk,)))
+
+    def test_large_table_follows_settings(self):
+        model_admin = UserAdmin(User, admin.site)
+        with self.settings(USERNAMELESS_ADMIN_LARGE_TABLE=True):
+            self.failUnless(model_admin.large_table)
+        self.failIf(model_admin.large_table)
+
+
+class TestUserForms(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', 'alice@wonderland.com',
+                                              'secret')
+
+    def test_case_variant_email(self):
+        form = UserCreationForm(data={'name': 'alice',
+                                      'email': 'Alice@Wonderland.com',
+                                      'password1': 'secret',
+                                      'password2': 'secret'})
+        self.failIf(form.is_valid())
+        self.failUnless('email' in form.errors)
+
+    def test_change_keeps_own_email(self):
+        form = UserChangeForm(instance=self.alice, data={
+            'name': 'alice', 'email': 'ALICE@wonderland.com',
+            'password': self.alice.password, 'slug': self.alice.slug,
+            'date_joined': self.alice.date_joined, 'is_active': True})
+        form.is_valid()
+        self.failIf('email' in form.errors)
+
+
+class TestBulkActions(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin',
+                                                   'admin@wonderland.com',
+                                                   'secret')
+        self.client.login(username='admin@wonderland.com', password='secret')
+        self.ids = [User.objects.create_user('user %d' % i,
+                                             'user%d@wonderland.com' % i).pk
+                    for i in range(5)]
+        self.url = reverse('admin:usernameless_user_changelist')
+
+    def post(self, action, **data):
+        data.update({'action': action, 'index': 0,
+                     '_selected_action': self.ids + [self.admin.pk]})
+        return self.client.post(self.url, data)
+
+    def test_bulk_deactivate(self):
+        batches = []
+
+        def record(sender, ids, **kwargs):
+            batches.append(ids)
+        users_updated.connect(record, sender=User)
+        try:
+            self.post('bulk_deactivate')
+        finally:
+            users_updated.disconnect(record, sender=User)
+        self.assertEqual(User.objects.filter(is_active=False).count(), 5)
+        self.failUnless(User.objects.get(pk=self.admin.pk).is_active)
+        self.assertEqual([sorted(ids) for ids in batches], [self.ids])
+        entry = LogEntry.objects.get()
+        self.assertEqual(entry.object_id, '')
+        self.assertEqual(entry.get_admin_url(), None)
+        self.assertEqual(entry.change_message, 'Deactivated 5 users.')
+
+    def test_bulk_delete(self):
+        response = self.post('bulk_delete')
+        self.assertContains(response, 'name="post"')
+        self.assertEqual(User.objects.count(), 6)
+        self.post('bulk_delete', post='yes')
+        self.assertEqual(list(User.objects.values_list('pk', flat=True)),
+                         [self.admin.pk])
+
+    def test_truncated_search(self):
+        model_admin = admin.site._registry[User]
+        limit, model_admin.search_limit = model_admin.search_limit, 3
+        try:
+            response = self.client.get(self.url, {'q': 'user'})
+        finally:
+            model_admin.search_limit = limit
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        self.assertContains(response, 'Only the first 3 matches')
@@ -0,0 +1,210 @@
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import Group, Permission
+from django.core.urlresolvers import reverse
+
+from .. import backends
+from ..caches import TTLCache
+from ..forms import AuthenticationForm
+from ..models import User
+from ..snapshots import LazyUser
+from ..throttling import TokenBucket
+
+# a cache shared by every instance in this process, standing in for one
+# shared between processes
+LOCMEM = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+class TestTTLCache(TestCase):
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('b'), None)
+
+    def test_expiry(self):
+        cache = TTLCache(ttl=-1)
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), None)
+
+    def test_shared_delete(self):
+        caches = [TTLCache(cache_alias=LOCMEM, prefix='test:ttl')
+                  for i in range(2)]
+        caches[0].set('a', 1)
+        self.assertEqual(caches[1].get('a'), 1)
+        caches[1].delete('a')
+        self.assertEqual(caches[0].get('a'), None)
+
+    def test_incr(self):
+        cache = TTLCache()
+        self.assertEqual(cache.incr('a'), 1)
+        self.assertEqual(cache.incr('a', 2), 3)
+
+
+class TestTokenBucket(TestCase):
+
+    def test_consume(self):
+        bucket = TokenBucket(2, 60)
+        self.failUnless(bucket.consume('a'))
+        self.failUnless(bucket.consume('a'))
+        self.failIf(bucket.consume('a'))
+        self.failUnless(bucket.consume('b'))
+
+    def test_shared_between_instances(self):
+        # two processes' buckets on one cache
+        buckets = [TokenBucket(3, 60, cache_alias=LOCMEM,
+                               prefix='test:bucket') for i in range(2)]
+        allowed = [buckets[i % 2].consume('a') for i in range(20)]
+        self.assertEqual(allowed.count(True), 3)
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=('usernameless.backends.EmailBackend',),
+    USERNAMELESS_LOGIN_IP_LIMIT=(3, 60),
+    USERNAMELESS_LOGIN_EMAIL_LIMIT=(10, 60))
+class TestEmailBackend(TestCase):
+
+    def setUp(self):
+        backends.reset()
+
+    def tearDown(self):
+        backends.reset()
+
+    def test_authenticate(self):
+        user = User.objects.create_user('alice', 'alice@wonderland.com',
+                                        'secret')
+        self.assertEqual(authenticate(username='Alice@Wonderland.com',
+                                      password='secret'), user)
+        self.assertEqual(authenticate(username='alice@wonderland.com',
+                                      password='wrong'), None)
+        self.assertEqual(authenticate(username='bob@wonderland.com',
+                                      password='secret'), None)
+
+    def test_email_not_backfilled(self):
+        user = User.objects.create_user('alice', 'Alice@wonderland.com',
+                                        'secret')
+        User.objects.filter(pk=user.pk).update(normalized_email=None)
+        self.assertEqual(authenticate(username='alice@wonderland.com',
+                                      password='secret'), user)
+
+    def test_unknown_email_is_cached(self):
+        self.assertEqual(authenticate(username='bob@wonderland.com',
+                                      password='secret'), None)
+        with self.assertNumQueries(0):
+            self.assertEqual(authenticate(username='bob@wonderland.com',
+                                          password='secret'), None)
+
+    def test_new_user_clears_cached_email(self):
+        authenticate(username='bob@wonderland.com', password='secret')
+        user = User.objects.create_user('bob', 'bob@wonderland.com', 'secret')
+        self.assertEqual(authenticate(username='bob@wonderland.com',
+                                      password='secret'), user)
+
+    def test_rate_limit_per_ip(self):
+        request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+        User.objects.create_user('bob', 'bob@wonderland.com', 'secret')
+        for i in range(3):
+            authenticate(username='bob%d@wonderland.com' % i,
+                         password='secret', request=request)
+        # a throttled attempt fails like a wrong password
+        self.assertEqual(authenticate(username='bob@wonderland.com',
+                                      password='secret', request=request),
+                         None)
+
+    @override_settings(USERNAMELESS_LOGIN_EMAIL_LIMIT=(2, 60))
+    def test_rate_limit_per_email(self):
+        User.objects.create_user('bob', 'bob@wonderland.com', 'secret')
+        for i in range(2):
+            authenticate(username='bob@wonderland.com', password='wrong')
+        self.assertEqual(authenticate(username='bob@wonderland.com',
+                                      password='secret'), None)
+
+    @override_settings(USERNAMELESS_LOGIN_EMAIL_LIMIT=(2, 60))
+    def test_rate_limited_form_counts_once(self):
+        User.objects.create_user('bob', 'bob@wonderland.com', 'secret')
+        for i in range(2):
+            form = AuthenticationForm(data={'username': 'bob@wonderland.com',
+                                            'password': 'secret'})
+            self.failUnless(form.is_valid())
+
+    def test_rate_limited_login_view(self):
+        login_url = reverse('auth_login')
+        for i in range(3):
+            self.client.post(login_url, {
+                'username': 'bob%d@wonderland.com' % i,
+                'password': 'secret'})
+        response = self.client.post(login_url, {
+            'username': 'bob@wonderland.com',
+            'password': 'secret'})
+        self.assertFormError(response, 'form', None,
+                             AuthenticationForm.error_messages['rate_limited'])
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=('usernameless.backends.EmailBackend',))
+class TestCachedPermissions(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@wonderland.com',
+                                             'secret')
+        self.group = Group.objects.create(name='editors')
+        self.group.permissions.add(
+            Permission.objects.get(codename='change_group'))
+        self.user.groups.add(self.group)
+
+    def fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def test_warm_cache_skips_queries(self):
+        self.failUnless(self.fresh_user().has_perm('auth.change_group'))
+        user = self.fresh_user()
+        with self.assertNumQueries(0):
+            self.failUnless(user.has_perm('auth.change_group'))
+
+    def test_group_permission_change_invalidates(self):
+        self.failIf(self.fresh_user().has_perm('auth.add_group'))
+        self.group.permissions.add(Permission.objects.get(codename='add_group'))
+        self.failUnless(self.fresh_user().has_perm('auth.add_group'))
+
+    def test_membership_change_invalidates(self):
+        self.failUnless(self.fresh_user().has_perm('auth.change_group'))
+        self.group.user_set.remove(self.user)
+        self.failIf(self.fresh_user().has_perm('auth.change_group'))
+
+
+@override_settings(
+    AUTHENTICATION_BACKENDS=('usernameless.backends.EmailBackend',),
+    USERNAMELESS_USER_CACHE='default')
+class TestUserCache(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('alice', 'alice@wonderland.com',
+                                             'secret')
+        self.backend = backends.EmailBackend()
+
+    def test_snapshot_skips_queries(self):
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+            self.failUnless(isinstance(user, LazyUser))
+            self.failUnless(isinstance(user, User))
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.slug, self.user.slug)
+            self.failUnless(user.is_active)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.date_joined, self.user.date_joined)
+            self.assertEqual(user.password, self.user.password)
+
+    def test_save_invalidates(self):
+        self.backend.get_user(self.user.pk)
+        self.user.is_active = False
+        self.user.save()
+        user = self.backend.get_user(self.user.pk)
+        self.failIf(isinstance(user, LazyUser))
+        self.failIf(user.is_active)
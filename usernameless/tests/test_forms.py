@@ -5,15 +5,22 @@ from django.contrib.auth import get_user_model
 from django.core.urlresolvers import reverse
 from django.core import mail
 
+from .. import backends, reset
 from ..forms import (RegistrationForm,
                      AuthenticationForm,
                      PasswordResetForm,
                      SetPasswordForm)
+from ..mail import OutboxSender
+from ..models import OutboxMessage
 
 User = get_user_model()
 
 
 class TestRegistrationForm(TestCase):
+    def setUp(self):
+        reset.clear()
+        backends.reset()
+
     def test_name_field(self):
         data = {'data': {'name': '',
                          'email': 'alice@wonderland.com',
@@ -40,6 +47,15 @@ class TestRegistrationForm(TestCase):
                                       'password2': 'foo'})
         self.failUnless(form.is_valid())
 
+    def test_unique_email_ignores_case(self):
+        User.objects.create_user('alice', 'alice@wonderland.com', 'secret')
+        form = RegistrationForm(data={'name': 'alice',
+                                      'email': 'Alice@Wonderland.com',
+                                      'password1': 'secret',
+                                      'password2': 'secret'})
+        self.failIf(form.is_valid())
+        self.assertEqual(form.errors['email'], [u'This email is already taken.'])
+
     def test_authentication_form(self):
         response = self.client.get(reverse('auth_login'))
         self.failUnless(isinstance(response.context['form'], AuthenticationForm))
@@ -58,8 +74,52 @@ class TestRegistrationForm(TestCase):
         # request a password reset
         data = {'email': user.email}
         self.client.post(reverse('auth_password_reset'), data=data)
+        OutboxSender().drain()
 
         urlmatch = re.search(r"https?://[^/]*(/.*reset/\S*)", mail.outbox[0].body)
         url = urlmatch.groups()[0]
         response = self.client.get(url)
         self.failUnless(isinstance(response.context['form'], SetPasswordForm))
+
+    def test_helper_is_shared(self):
+        first = AuthenticationForm()
+        second = AuthenticationForm(data={})
+        self.assertTrue(first.helper is second.helper)
+        self.assertFalse(first.helper is RegistrationForm().helper)
+        self.assertIn(reverse('auth_password_reset'),
+                      first.helper.layout.fields[2].fields[1].fields[0].html)
+
+
+class TestPasswordReset(TestCase):
+    def setUp(self):
+        reset.clear()
+        backends.reset()
+        self.user = User.objects.create_user('alice', 'alice@wonderland.com',
+                                             'secret')
+
+    def tearDown(self):
+        reset.clear()
+        backends.reset()
+
+    def test_reset_is_queued_once(self):
+        url = reverse('auth_password_reset')
+        self.client.post(url, data={'email': 'Alice@Wonderland.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        # a repeated request within the window neither queries nor mails
+        form = PasswordResetForm(data={'email': 'alice@wonderland.com'})
+        with self.assertNumQueries(0):
+            self.failUnless(form.is_valid())
+            form.save(domain_override='example.com')
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+        OutboxSender().drain()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alice@wonderland.com'])
+
+    def test_unknown_email_is_cached(self):
+        form = PasswordResetForm(data={'email': 'bob@ong.com'})
+        self.failIf(form.is_valid())
+        form = PasswordResetForm(data={'email': 'bob@ong.com'})
+        with self.assertNumQueries(0):
+            self.failIf(form.is_valid())
@@ -0,0 +1,40 @@
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.contrib.auth.hashers import make_password
+
+from ..hashing import HashingExecutor, HashingQueueFull
+from ..middleware import HashingBackpressureMiddleware
+
+
+class TestHashingExecutor(TestCase):
+
+    def test_make_and_check_password(self):
+        executor = HashingExecutor()
+        encoded = executor.make_password('secret')
+        self.failUnless(executor.check_password('secret', encoded))
+        self.failIf(executor.check_password('wrong', encoded))
+        self.assertEqual(executor.stats()['completed'], 3)
+        self.assertEqual(executor.stats()['pending'], 0)
+
+    def test_rejects_when_full(self):
+        executor = HashingExecutor(max_pending=1)
+        executor._slots.acquire()
+        self.assertRaises(HashingQueueFull, executor.make_password, 'secret')
+        self.assertEqual(executor.stats()['rejected'], 1)
+        executor._slots.release()
+        self.failUnless(executor.make_password('secret'))
+
+    def test_upgrades_password_hash(self):
+        encoded = make_password('secret', hasher='sha1')
+        upgraded = []
+        self.failUnless(HashingExecutor().check_password('secret', encoded,
+                                                         upgraded.append))
+        self.assertEqual(upgraded, ['secret'])
+
+    def test_middleware_rejects_with_503(self):
+        request = RequestFactory().get('/')
+        response = HashingBackpressureMiddleware().process_exception(
+            request, HashingQueueFull())
+        self.assertEqual(response.status_code, 503)
+        self.failUnless(response['Retry-After'])
+
@@ -0,0 +1,49 @@
+from django.test import TestCase
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.contrib.sites.models import Site
+
+from registration.models import RegistrationProfile
+
+from ..mail import OutboxSender
+from ..models import OutboxMessage
+
+
+class FailingBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise IOError('SMTP is down')
+
+
+class TestOutbox(TestCase):
+
+    raw_user = {'name': 'alice',
+                'email': 'alice@wonderland.com',
+                'password': 'secret'}
+
+    def register(self):
+        data = self.raw_user.copy()
+        data.update({'site': Site.objects.get_current()})
+        return RegistrationProfile.objects.create_inactive_user(**data)
+
+    def test_activation_email_is_queued(self):
+        self.register()
+        self.assertEqual(len(mail.outbox), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.recipient_list(), ['alice@wonderland.com'])
+
+        self.assertEqual(OutboxSender().drain(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['alice@wonderland.com'])
+        self.failUnless(OutboxMessage.objects.get().sent)
+        self.assertEqual(OutboxSender().drain(), 0)
+
+    def test_failed_batch_is_retried_later(self):
+        self.register()
+        backend = 'usernameless.tests.test_mail.FailingBackend'
+        self.assertEqual(OutboxSender(backend=backend).drain(), 0)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.attempts, 1)
+        self.failIf(message.sent)
+        self.failUnless(message.next_attempt > message.created)
+        # not due yet
+        self.assertEqual(OutboxSender().drain(), 0)
@@ -0,0 +1,55 @@
+import time
+
+from django.contrib.sites.models import Site
+from django.test import TestCase
+from django.test.utils import override_settings
+
+from registration.models import RegistrationProfile
+
+from ..metrics import BaseMetrics, stage
+
+
+class RecordingMetrics(BaseMetrics):
+    reports = []
+
+    def report(self, name, seconds, queries=None):
+        self.reports.append((name, queries))
+
+
+@override_settings(
+    USERNAMELESS_METRICS='usernameless.tests.test_metrics.RecordingMetrics',
+    USERNAMELESS_METRICS_QUERIES=True)
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        del RecordingMetrics.reports[:]
+
+    def test_registration_stages(self):
+        RegistrationProfile.objects.create_inactive_user(
+            'alice', 'alice@wonderland.com', 'secret',
+            Site.objects.get_current())
+        reports = dict(RecordingMetrics.reports)
+        self.assertEqual(reports['create_profile'], 1)
+        self.assertEqual(reports['set_password'], 0)
+        self.assertEqual(reports['activation_email'], 1)
+        self.failUnless(reports['create_inactive_user'] >=
+                        reports['save_user'] + 2)
+
+    def test_nested_stages_count_separately(self):
+        with stage('outer'):
+            Site.objects.count()
+            with stage('inner'):
+                list(Site.objects.all())
+        self.assertEqual(RecordingMetrics.reports,
+                         [('inner', 1), ('outer', 2)])
+
+    def test_overhead_is_bounded(self):
+        with self.settings(USERNAMELESS_METRICS_QUERIES=False):
+            start = time.time()
+            for i in range(1000):
+                with stage('noop'):
+                    pass
+            elapsed = time.time() - start
+        self.assertEqual(len(RecordingMetrics.reports), 1000)
+        # well under a tenth of a millisecond per stage
+        self.failUnless(elapsed < 0.1, elapsed)
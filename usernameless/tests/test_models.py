@@ -1,9 +1,21 @@
-from django.test import TestCase
+import datetime
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import Group
 from django.contrib.sites.models import Site
+from django.core.management import call_command
+from django.utils import timezone
 
 from registration.models import RegistrationProfile
 
-from ..models import User
+from ..models import User, SlugCounter, prefetch_profiles
 
 
 class TestUserModel(TestCase):
@@ -24,6 +36,91 @@ class TestUserModel(TestCase):
         self.failUnless(user.is_admin)
         self.failUnless(user.is_superuser)
 
+    def test_normalized_email(self):
+        data = dict(self.raw_user, email='Alice@Wonderland.COM')
+        user = User.objects.create_user(**data)
+        self.assertEqual(user.normalized_email, 'alice@wonderland.com')
+        self.assertEqual(User.objects.get_by_natural_key('ALICE@wonderland.com'),
+                         user)
+        self.failUnless(User.objects.email_exists('alice@WONDERLAND.com'))
+
+    def test_bulk_create_users(self):
+        User.objects.create_user(**self.raw_user)
+        users = [{'name': 'alice', 'email': 'alice%d@wonderland.com' % i,
+                  'password': 'secret'} for i in range(3)]
+        created = User.objects.bulk_create_users(users, batch_size=2,
+                                                 processes=1)
+        self.assertEqual(created, 3)
+        self.assertEqual(sorted(User.objects.values_list('slug', flat=True)),
+                         ['alice', 'alice-2', 'alice-3', 'alice-4'])
+        user = User.objects.get(email='alice0@wonderland.com')
+        self.failUnless(user.check_password('secret'))
+
+    def test_bulk_create_users_requires_email(self):
+        self.assertRaises(ValueError, User.objects.bulk_create_users,
+                          [{'name': 'alice'}], processes=1)
+
+    def test_stream_export(self):
+        alice = User.objects.create_user(**self.raw_user)
+        User.objects.create_user('bob', 'bob@ong.com')
+        alice.groups.add(Group.objects.create(name='writers'),
+                         Group.objects.create(name='readers'))
+        # a user query and a membership query per chunk, then the
+        # empty user query
+        with self.assertNumQueries(5):
+            rows = list(User.objects.stream_export(chunk_size=1))
+        self.assertEqual([(row[0], row[5]) for row in rows],
+                         [('alice', ['readers', 'writers']), ('bob', [])])
+
+    def test_export_users_command(self):
+        User.objects.create_user(**self.raw_user)
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'users.jsonl.gz')
+            call_command('export_users', path)
+            lines = gzip.open(path).read().splitlines()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0].decode('utf-8'))['email'],
+                         'alice@wonderland.com')
+
+
+class TestUserSlug(TestCase):
+
+    def create_user(self, name, i):
+        return User.objects.create_user(name, 'user%d@wonderland.com' % i,
+                                        'secret')
+
+    def test_sequential_slugs(self):
+        slugs = [self.create_user('Alice', i).slug for i in range(3)]
+        self.assertEqual(slugs, ['alice', 'alice-2', 'alice-3'])
+        self.assertEqual(SlugCounter.objects.get(base='alice').last_index, 3)
+
+    def test_skips_slugs_taken_by_other_names(self):
+        self.create_user('Alice', 0)
+        self.create_user('Alice 2', 1)
+        self.assertEqual(self.create_user('Alice', 2).slug, 'alice-3')
+
+    def test_seeds_counter_from_existing_slugs(self):
+        for i in range(3):
+            self.create_user('Alice', i)
+        SlugCounter.objects.all().delete()
+        self.assertEqual(self.create_user('Alice', 3).slug, 'alice-4')
+
+    def test_slug_kept_on_save(self):
+        user = self.create_user('Alice', 0)
+        user.name = 'Bob'
+        user.save()
+        self.assertEqual(User.objects.get(pk=user.pk).slug, 'alice')
+        self.assertEqual(user.get_absolute_url(), '/users/alice/')
+
+    def test_bulk_create_users_syncs_counters(self):
+        User.objects.bulk_create_users([{'name': 'Alice',
+                                         'email': 'bulk%d@wonderland.com' % i}
+                                        for i in range(2)], processes=1)
+        self.assertEqual(self.create_user('Alice', 0).slug, 'alice-3')
+
 
 class TestRegistationManager(TestCase):
 
@@ -38,7 +135,99 @@ class TestRegistationManager(TestCase):
         self.failUnless(user)
         self.failIf(user.is_active)
 
+    # an in-memory index, so the count doesn't depend on the database's
+    # search index, which adds its own INSERT
+    @override_settings(
+        USERNAMELESS_SEARCH_BACKEND='usernameless.search.NgramBackend')
+    def test_create_inactive_user_queries(self):
+        SlugCounter.objects.create(base='alice')
+        data = self.raw_user.copy()
+        data.update({'site': Site.objects.get_current()})
+        # slug counter UPDATE and SELECT, slug availability check, then
+        # the user, profile and outbox INSERTs.
+        with self.assertNumQueries(6):
+            RegistrationProfile.objects.create_inactive_user(**data)
+
     def test_create_profile(self):
         user = User.objects.create_user(**self.raw_user)
         registration_profile = RegistrationProfile.objects.create_profile(user)
         self.failUnless(registration_profile)
+
+    def test_activate_user(self):
+        data = self.raw_user.copy()
+        data.update({'site': Site.objects.get_current()})
+        user = RegistrationProfile.objects.create_inactive_user(**data)
+        key = RegistrationProfile.objects.get(user=user).activation_key
+        self.assertEqual(len(key), 40)
+
+        # profile lookup, user UPDATE and profile UPDATE
+        with self.assertNumQueries(3):
+            activated = RegistrationProfile.objects.activate_user(key)
+        self.assertEqual(activated, user)
+        self.failUnless(activated.is_active)
+        self.failUnless(User.objects.get(pk=user.pk).is_active)
+        # a second click finds the key used up
+        self.failIf(RegistrationProfile.objects.activate_user(key))
+
+    def test_purge_registrations(self):
+        site = Site.objects.get_current()
+        long_ago = timezone.now() - datetime.timedelta(days=365)
+        expired = RegistrationProfile.objects.create_inactive_user(
+            site=site, **self.raw_user)
+        expired.groups.add(Group.objects.create(name='readers'))
+        recent = RegistrationProfile.objects.create_inactive_user(
+            'bob', 'bob@ong.com', 'secret', site)
+        deactivated = RegistrationProfile.objects.create_inactive_user(
+            'carol', 'carol@wonderland.com', 'secret', site)
+        RegistrationProfile.objects.filter(user=deactivated).update(
+            activation_key=RegistrationProfile.ACTIVATED)
+        User.objects.filter(pk__in=[expired.pk, deactivated.pk]).update(
+            date_joined=long_ago)
+
+        call_command('purge_registrations', batch_size=1, sleep=0,
+                     verbosity=0)
+        self.assertEqual(sorted(User.objects.values_list('pk', flat=True)),
+                         sorted([recent.pk, deactivated.pk]))
+        self.failIf(RegistrationProfile.objects.filter(user=expired.pk))
+        self.failIf(User.groups.through.objects.filter(user=expired.pk))
+
+
+@override_settings(AUTH_PROFILE_MODULE='registration.RegistrationProfile')
+class TestProfilePrefetch(TestCase):
+
+    def setUp(self):
+        for i in range(3):
+            user = User.objects.create_user('user %d' % i,
+                                            'user%d@example.com' % i)
+            RegistrationProfile.objects.create_profile(user)
+        User.objects.create_user('carol', 'carol@example.com')
+
+    def test_with_profiles(self):
+        with self.assertNumQueries(2):
+            users = list(User.objects.with_profiles().order_by('pk'))
+            for user in users[:3]:
+                self.assertEqual(user.get_profile().user, user)
+        self.assertRaises(RegistrationProfile.DoesNotExist,
+                          users[3].get_profile)
+
+    def test_prefetch_profiles_in_batches(self):
+        users = list(User.objects.all())
+        with self.assertNumQueries(2):
+            prefetch_profiles(users, batch_size=2)
+        with self.assertNumQueries(0):
+            prefetch_profiles(users[:3])
+
+
+class TestBulkDelete(TransactionTestCase):
+
+    def test_batches_are_committed(self):
+        ids = [User.objects.create_user('user %d' % i,
+                                        'user%d@wonderland.com' % i).pk
+               for i in range(3)]
+        group = Group.objects.create(name='editors')
+        User.objects.get(pk=ids[0]).groups.add(group)
+        self.assertEqual(User.objects.bulk_delete(ids, batch_size=2), 3)
+        # nothing is left for a rollback to bring back
+        transaction.rollback()
+        self.assertEqual(User.objects.count(), 0)
+        self.assertEqual(User.groups.through.objects.count(), 0)
@@ -0,0 +1,65 @@
+import time
+
+from django.contrib.auth.models import Group
+from django.http import HttpResponse
+from django.test import TestCase
+from django.test.client import RequestFactory
+from django.test.utils import override_settings
+
+from registration.models import RegistrationProfile
+
+from .. import routers
+from ..models import User
+
+
+@override_settings(USERNAMELESS_PRIMARY='default',
+                   USERNAMELESS_REPLICAS=['replica'])
+class TestReplicaRouter(TestCase):
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.middleware = routers.ReplicaStickinessMiddleware()
+        self.factory = RequestFactory()
+        routers.unpin()
+
+    def tearDown(self):
+        routers.unpin()
+
+    def test_reads_go_to_replicas(self):
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        self.assertEqual(self.router.db_for_read(RegistrationProfile),
+                         'replica')
+        self.assertEqual(self.router.db_for_read(Group), None)
+        self.assertEqual(self.router.db_for_write(User), 'default')
+
+    def test_write_pins_request_and_sets_cookie(self):
+        request = self.factory.get('/')
+        self.middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+        self.router.db_for_write(User)
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        response = self.middleware.process_response(request, HttpResponse())
+        self.failUnless('usernameless_primary' in response.cookies)
+
+        request = self.factory.get('/')
+        request.COOKIES['usernameless_primary'] = \
+            response.cookies['usernameless_primary'].value
+        self.middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        response = self.middleware.process_response(request, HttpResponse())
+        self.failIf('usernameless_primary' in response.cookies)
+
+    def test_expired_cookie_and_unsafe_methods(self):
+        request = self.factory.get('/')
+        request.COOKIES['usernameless_primary'] = '1'
+        self.middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(User), 'replica')
+
+        self.middleware.process_request(self.factory.post('/'))
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_far_future_cookie_is_ignored(self):
+        request = self.factory.get('/')
+        request.COOKIES['usernameless_primary'] = str(time.time() + 3600)
+        self.middleware.process_request(request)
+        self.assertEqual(self.router.db_for_read(User), 'replica')
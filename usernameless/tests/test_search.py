@@ -0,0 +1,68 @@
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils.unittest import skipUnless
+
+from ..models import User
+from ..search import NgramBackend, SQLiteFTSBackend, get_search_backend
+
+
+class TestUserSearch(TestCase):
+
+    def setUp(self):
+        self.alice = User.objects.create_user('Alice Liddell',
+                                              'alice@wonderland.com', 'secret')
+        self.bob = User.objects.create_user('Bob Ong', 'bob@ong.com', 'secret')
+
+    def test_search_by_name(self):
+        self.assertEqual(User.objects.search('lidd'), [self.alice])
+        self.assertEqual(User.objects.search('alice liddell'), [self.alice])
+
+    def test_search_by_email(self):
+        self.assertEqual(User.objects.search('bob@'), [self.bob])
+
+    def test_index_follows_changes(self):
+        self.bob.name = 'Robert Ong'
+        self.bob.save()
+        self.assertEqual(User.objects.search('robert'), [self.bob])
+        self.bob.delete()
+        self.assertEqual(User.objects.search('robert'), [])
+
+
+class TestNgramBackend(TestCase):
+
+    def test_search(self):
+        alice = User.objects.create_user('Alice Liddell',
+                                         'alice@wonderland.com', 'secret')
+        backend = NgramBackend(User)
+        self.assertEqual(backend.search('iddel', 10), [alice.pk])
+        self.assertEqual(backend.search('WONDER', 10), [alice.pk])
+        self.assertEqual(backend.search('nobody', 10), [])
+
+        bob = User.objects.create_user('Bob Ong', 'bob@ong.com', 'secret')
+        backend.index(bob)
+        self.assertEqual(backend.search('ong', 10), [bob.pk])
+        backend.remove(bob.pk)
+        self.assertEqual(backend.search('ong', 10), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+class TestSQLiteFTSBackend(TransactionTestCase):
+
+    def test_indexing_keeps_transaction(self):
+        # DDL would commit the user before the rollback
+        try:
+            with transaction.commit_on_success():
+                User.objects.create_user('Alice Liddell',
+                                         'alice@wonderland.com', 'secret')
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(User.objects.count(), 0)
+
+    def test_search(self):
+        alice = User.objects.create_user('Alice Liddell',
+                                         'alice@wonderland.com', 'secret')
+        backend = get_search_backend(User)
+        if isinstance(backend, SQLiteFTSBackend):
+            self.failUnless(backend.is_ready('default'))
+        self.assertEqual(backend.search('lidd', 10), [alice.pk])
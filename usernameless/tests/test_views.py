@@ -1,3 +1,7 @@
+import os
+import subprocess
+import sys
+
 from django.test import TestCase
 from django.core.urlresolvers import reverse
 
@@ -13,3 +17,66 @@ class TestRegistrationViews(TestCase):
         response = self.client.post(reverse('registration_register'), data=data)
         self.assertRedirects(response, reverse('registration_complete'))
         self.assertEqual(User.objects.count(), 1)
+
+    def test_registration_duplicate_email(self):
+        User.objects.create_user('alice', 'alice@wonderland.com', 'secret')
+        data = {'name': 'alice',
+                'email': 'Alice@wonderland.com',
+                'password1': 'secret',
+                'password2': 'secret'}
+        response = self.client.post(reverse('registration_register'), data=data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'email',
+                             u'This email is already taken.')
+        self.assertEqual(User.objects.count(), 1)
+
+
+class TestURLs(TestCase):
+    def test_upstream_patterns_untouched(self):
+        from registration.auth_urls import urlpatterns as auth_urlpatterns
+        from registration.backends.default import urls, views
+        register = [p for p in urls.urlpatterns
+                    if getattr(p, 'name', None) == 'registration_register']
+        self.assertEqual(register[0].callback.__module__, views.__name__)
+        self.failIf(any('authentication_form' in p.default_args
+                        for p in auth_urlpatterns))
+
+    def test_receivers_connect_once(self):
+        from django.db.models.signals import post_save
+        from ..receivers import connect
+        count = len(post_save.receivers)
+        connect()
+        self.assertEqual(len(post_save.receivers), count)
+
+
+# Loads the app cache of the test settings, with django-registration and
+# usernameless last in the order given on the command line, and exits
+# with 0 when django-registration got patched.
+LOAD_APPS = """
+import os, sys
+from django.conf import settings
+from django.utils.importlib import import_module
+module = import_module(os.environ['DJANGO_SETTINGS_MODULE'])
+options = dict((name, getattr(module, name))
+               for name in dir(module) if name.isupper())
+options['INSTALLED_APPS'] = [app for app in options['INSTALLED_APPS']
+                             if app not in sys.argv[1:]] + sys.argv[1:]
+settings.configure(**options)
+from django.db.models import get_models
+get_models()
+from registration.models import RegistrationManager
+from usernameless.models import create_inactive_user
+sys.exit(RegistrationManager.__dict__['create_inactive_user']
+         is not create_inactive_user)
+"""
+
+
+class TestAppLoading(TestCase):
+    def load_apps(self, *apps):
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        return subprocess.call([sys.executable, '-c', LOAD_APPS] + list(apps),
+                               env=env)
+
+    def test_registration_patched(self):
+        self.assertEqual(self.load_apps('registration', 'usernameless'), 0)
+        self.assertEqual(self.load_apps('usernameless', 'registration'), 0)
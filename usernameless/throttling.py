@@ -0,0 +1,52 @@
+"""
+Token bucket rate limiting for login attempts.
+"""
+
+import threading
+import time
+
+from .caches import TTLCache
+
+
+class TokenBucket(object):
+    """
+    Allows bursts of up to ``capacity`` attempts per key, refilled at
+    ``capacity`` tokens every ``period`` seconds.
+
+    Bucket state lives in a ``TTLCache``; an entry may expire once its
+    bucket would have refilled completely, so idle keys cost nothing.
+
+    With ``cache_alias``, attempts are instead counted in the shared
+    cache per fixed window of ``period`` seconds with an atomic
+    ``incr``, so the limit holds across processes. Up to twice
+    ``capacity`` attempts may then pass around a window boundary.
+    """
+    def __init__(self, capacity, period, maxsize=100000, cache_alias=None,
+                 prefix='usernameless:bucket'):
+        self.capacity = float(capacity)
+        self.period = period
+        self.rate = self.capacity / period
+        self.buckets = TTLCache(maxsize=maxsize,
+                                ttl=period,
+                                cache_alias=cache_alias,
+                                prefix=prefix)
+        self._lock = threading.Lock()
+
+    def consume(self, key, tokens=1):
+        """
+        Takes ``tokens`` from the bucket of ``key``, returning ``False``
+        when the bucket doesn't hold enough.
+        """
+        now = time.time()
+        if self.buckets.shared is not None:
+            window = int(now // self.period)
+            return (self.buckets.incr('%s:%d' % (key, window), tokens)
+                    <= self.capacity)
+        with self._lock:
+            level, updated = self.buckets.get(key, (self.capacity, now))
+            level = min(self.capacity, level + (now - updated) * self.rate)
+            allowed = level >= tokens
+            if allowed:
+                level -= tokens
+            self.buckets.set(key, (level, now))
+        return allowed
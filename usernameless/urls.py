@@ -1,31 +1,70 @@
 """
-An override to registration.backend.default.urls so we
-can pass our custom RegistrationView with a custom form.
-"""
+The URLs of registration.backends.default.urls and
+registration.auth_urls, with the same names, using our custom
+RegistrationView and forms.
 
-from django.conf.urls import url
+They are listed explicitly instead of patching django-registration's
+own lists, which are shared with anyone else including them.
+"""
 
-from registration.backends.default.urls import urlpatterns
-from registration.auth_urls import urlpatterns as auth_urlpatterns
+from django.conf.urls import patterns, url
+from django.contrib.auth import views as auth_views
+from django.views.generic.base import TemplateView
 
-from .views import RegistrationView
-from .forms import AuthenticationForm, PasswordResetForm, SetPasswordForm
+from registration.backends.default.views import ActivationView
 
+from .views import RegistrationView, login
+from .forms import PasswordResetForm, SetPasswordForm
 
-# override the url for accounts/register
-# with our custom RegistrationView.
-urlpatterns[2] = url(
-    r'^register/$',
-    RegistrationView.as_view(),
-    name='registration_register'
-)
 
-# remove relative resolution of auth_urls
-# and instead concatenate auth_urls directly.
-del urlpatterns[5]
-urlpatterns += auth_urlpatterns
+urlpatterns = patterns('',
+    url(r'^activate/complete/$',
+        TemplateView.as_view(
+            template_name='registration/activation_complete.html'),
+        name='registration_activation_complete'),
+    # matches any key so that bad keys get the view's "invalid key"
+    # page instead of a 404
+    url(r'^activate/(?P<activation_key>\w+)/$',
+        ActivationView.as_view(),
+        name='registration_activate'),
+    url(r'^register/$',
+        RegistrationView.as_view(),
+        name='registration_register'),
+    url(r'^register/complete/$',
+        TemplateView.as_view(
+            template_name='registration/registration_complete.html'),
+        name='registration_complete'),
+    url(r'^register/closed/$',
+        TemplateView.as_view(
+            template_name='registration/registration_closed.html'),
+        name='registration_disallowed'),
 
-# override forms
-urlpatterns[5].default_args.update({'authentication_form': AuthenticationForm})
-urlpatterns[9].default_args.update({'password_reset_form': PasswordResetForm})
-urlpatterns[10].default_args.update({'set_password_form': SetPasswordForm})
+    url(r'^login/$',
+        login,
+        {'template_name': 'registration/login.html'},
+        name='auth_login'),
+    url(r'^logout/$',
+        auth_views.logout,
+        {'template_name': 'registration/logout.html'},
+        name='auth_logout'),
+    url(r'^password/change/$',
+        auth_views.password_change,
+        name='auth_password_change'),
+    url(r'^password/change/done/$',
+        auth_views.password_change_done,
+        name='auth_password_change_done'),
+    url(r'^password/reset/$',
+        auth_views.password_reset,
+        {'password_reset_form': PasswordResetForm},
+        name='auth_password_reset'),
+    url(r'^password/reset/confirm/(?P<uidb36>[0-9A-Za-z]+)-(?P<token>.+)/$',
+        auth_views.password_reset_confirm,
+        {'set_password_form': SetPasswordForm},
+        name='auth_password_reset_confirm'),
+    url(r'^password/reset/complete/$',
+        auth_views.password_reset_complete,
+        name='auth_password_reset_complete'),
+    url(r'^password/reset/done/$',
+        auth_views.password_reset_done,
+        name='auth_password_reset_done'),
+)
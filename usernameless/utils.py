@@ -0,0 +1,18 @@
+"""
+Small helpers shared across usernameless.
+"""
+
+from itertools import islice
+
+
+def chunked(iterable, size):
+    """
+    Yields lists of at most ``size`` items from ``iterable`` without
+    materializing the whole iterable.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
@@ -1,3 +1,6 @@
+from django.db import IntegrityError
+from django.contrib.auth import get_user_model
+from django.contrib.auth import views as auth_views
 from django.contrib.sites.models import RequestSite
 from django.contrib.sites.models import Site
 
@@ -6,24 +9,60 @@ from registration.models import RegistrationProfile
 from registration.backends.default.views import (
     RegistrationView as BaseRegistrationView)
 
-from .forms import RegistrationForm
+from .forms import AuthenticationForm, RegistrationForm
+from .metrics import stage
 
 
 class RegistrationView(BaseRegistrationView):
     form_class = RegistrationForm
 
+    def get_form_kwargs(self, request=None, form_class=None):
+        """
+        Skip the form's email uniqueness query, ``form_valid`` relies
+        on the unique constraint instead which also covers concurrent
+        double-submits.
+        """
+        kwargs = super(RegistrationView, self).get_form_kwargs(request,
+                                                               form_class)
+        kwargs['check_unique_email'] = False
+        return kwargs
+
+    def form_valid(self, request, form):
+        try:
+            return super(RegistrationView, self).form_valid(request, form)
+        except IntegrityError:
+            if not get_user_model().objects.email_exists(
+                    form.cleaned_data['email']):
+                raise
+            form._errors['email'] = form.error_class(
+                [form.duplicate_email_message])
+            return self.form_invalid(form)
+
     def register(self, request, **cleaned_data):
         """ We override register since the old one still uses username. """
         name, email, password = (cleaned_data['name'],
                                  cleaned_data['email'],
                                  cleaned_data['password1'])
-        if Site._meta.installed:
-            site = Site.objects.get_current()
-        else:
-            site = RequestSite(request)
-        new_user = RegistrationProfile.objects.create_inactive_user(
-            name, email, password, site)
-        signals.user_registered.send(sender=self.__class__,
-                                     user=new_user,
-                                     request=request)
+        with stage('register'):
+            if Site._meta.installed:
+                site = Site.objects.get_current()
+            else:
+                site = RequestSite(request)
+            new_user = RegistrationProfile.objects.create_inactive_user(
+                name, email, password, site)
+            signals.user_registered.send(sender=self.__class__,
+                                         user=new_user,
+                                         request=request)
         return new_user
+
+
+def login(request, authentication_form=AuthenticationForm, **kwargs):
+    """
+    Django's login view, but builds the form with the request, which
+    it only passes on GET, so ``AuthenticationForm`` throttles per IP.
+    """
+    def form_class(*args, **form_kwargs):
+        if not args:
+            form_kwargs['request'] = request
+        return authentication_form(*args, **form_kwargs)
+    return auth_views.login(request, authentication_form=form_class, **kwargs)